@@ -0,0 +1,443 @@
+"""
+Times the hot paths of stonestreetBudget on synthetic data, without a display.
+
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 --keys 10 1000
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<earlier>.json
+
+Each run is saved to benchmarks/results/<timestamp>-<commit>.json so that
+results can be compared across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import pandas as pd
+
+import stonestreetBudget as sb
+from synthetic import generate_mappings, generate_transactions
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Cold-start budgets in seconds. Importing the module must stay cheap and
+# must not pull in pandas or Tk; the first transaction has to be ready to
+# show within the per-size budget.
+IMPORT_BUDGET = 0.15
+FIRST_TRANSACTION_BUDGET = {1000: 0.1, 100000: 0.5, 1000000: 3.0}
+# Identifiers the suggestion benchmark labels descriptions with
+SUGGEST_IDENTIFIERS = ['Groceries', 'Coffee', 'Gas', 'Dining', 'Rent', 'Travel']
+
+
+def best_of(repeat, func, setup=None):
+    """
+    Returns the fastest of `repeat` timed calls to func(setup()).
+    """
+    best = None
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        func(arg) if setup else func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_import(repeat):
+    """
+    Time for a fresh interpreter to import stonestreetBudget, minus the
+    interpreter's own startup. Fails if the import loads pandas or tkinter.
+    """
+    probe = (
+        "import sys, time; start = time.perf_counter(); import stonestreetBudget; "
+        "elapsed = time.perf_counter() - start; "
+        "heavy = [m for m in ('pandas', 'numpy', 'tkinter') if m in sys.modules]; "
+        "print(elapsed, ','.join(heavy))"
+    )
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", probe], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.split()
+        if len(output) > 1:
+            raise RuntimeError(f"importing stonestreetBudget loaded {output[1]}")
+        best = float(output[0]) if best is None else min(best, float(output[0]))
+    return best
+
+
+def bench_first_transaction(csv_path, repeat):
+    """
+    The synchronous part of BudgetTrackerGUI startup: everything before the
+    first transaction is displayed. The parse cache is cleared each time.
+    """
+    def fresh():
+        shutil.rmtree(sb.cache_dir, ignore_errors=True)
+
+    def run(_):
+        sb.load_session_transactions(csv_path)
+
+    return best_of(repeat, run, fresh)
+
+
+def load_frame(csv_path):
+    """
+    The frame as BudgetTrackerGUI holds it after loading.
+    """
+    df, _ = sb.load_session_transactions(csv_path)
+    return df
+
+
+def bench_filter(csv_path, repeat):
+    """
+    filter_transactions_by_date on a fresh working directory (cold) and
+    again once the export has been ingested (warm).
+    """
+    def run(_):
+        sb.csv_file = csv_path
+        sb.filter_transactions_by_date('06', '2023')
+
+    def fresh():
+        for name in (sb.history_dir, sb.cache_dir):
+            shutil.rmtree(name, ignore_errors=True)
+
+    cold = best_of(repeat, run, fresh)
+    warm = best_of(repeat, run, lambda: None)
+    return {'filter_transactions_by_date (cold)': cold, 'filter_transactions_by_date (warm)': warm}
+
+
+def bench_apply_mappings(df, mappings, repeat):
+    def run(frame):
+        sb.apply_mappings(frame, mappings)
+
+    def cold():
+        sb._compile_mappings.cache_clear()
+        return df.copy()
+
+    return {
+        'apply_mappings (cold)': best_of(repeat, run, cold),
+        'apply_mappings (warm)': best_of(repeat, run, df.copy),
+    }
+
+
+def bench_add_mapping(df, mappings, repeat):
+    """
+    Adding one mapping key to an already labeled frame, as the Add Mapping
+    button does. The trigram index is built by the first call, so the best
+    time is the steady-state cost.
+    """
+    frame = df.copy()
+    index = sb.DescriptionIndex(frame['Normalized Description'])
+    sb.apply_mappings(frame, mappings, index)
+    mappings = dict(mappings)
+    key = frame['Normalized Description'].iloc[len(frame) // 2]
+    mappings[key] = 'Benchmark'
+
+    def run():
+        sb.apply_mapping_key(frame, mappings, key, index)
+
+    return {'add mapping (incremental)': best_of(repeat, run)}
+
+
+def bench_add_custom_identifier(df, repeat):
+    return {'add_custom_identifier': best_of(repeat, sb.add_custom_identifier, df.copy)}
+
+
+def bench_processed_store(df, repeat, lookups=1000):
+    """
+    Loading the processed store from a legacy CSV of every row, then
+    membership checks for `lookups` keys.
+    """
+    legacy = os.path.abspath("bench_processed.csv")
+    sb.to_export_frame(df)[['Transaction Date', 'Description', 'Amount']].to_csv(legacy, index=False)
+    keys = df['Transaction Key'].head(lookups).tolist()
+
+    def fresh():
+        if os.path.exists("bench_processed.db"):
+            os.remove("bench_processed.db")
+
+    def load(_):
+        sb.ProcessedTransactionStore("bench_processed.db", legacy).close()
+
+    store = None
+
+    def lookup():
+        for key in keys:
+            key in store
+
+    load_time = best_of(repeat, load, fresh)
+    store = sb.ProcessedTransactionStore("bench_processed.db", legacy)
+    lookup_time = best_of(repeat, lookup)
+    store.close()
+    return {'load_processed_transactions': load_time, f'processed membership x{len(keys)}': lookup_time}
+
+
+def headless_app(df, name):
+    """
+    A BudgetTrackerGUI with no window, its startup done, and its journal and
+    stores under `name`.
+    """
+    app = sb.BudgetTrackerGUI.__new__(sb.BudgetTrackerGUI)
+    app.transactions = df.copy()
+    app.transaction_index = sb.build_transaction_index(app.transactions)
+    app.refresh_label_counts()
+    app.view_positions = app.all_positions
+    app.current_index = 0
+    app.journal = sb.ChangeJournal(os.path.abspath(f"{name}.csv"))
+    app.journal_bytes = 0
+    app.undo_stack = []
+    app.suggester = sb.IdentifierSuggester()
+    app.suggester_updates = None
+    app.identifier_var = types.SimpleNamespace(get=lambda: 'Groceries')
+    app.processed_transactions = sb.ProcessedTransactionStore(f"{name}.db", "")
+    app.summary = sb.BudgetSummary(f"{name}_summary.db")
+    app.grid = None
+    app.hide_processed = types.SimpleNamespace(get=lambda: False)
+    app.transaction_counter_label = types.SimpleNamespace(config=lambda **kw: None)
+    app.display_transaction = lambda: None
+    app._startup_stages = []
+    app.writer = sb.BackgroundWriter(types.SimpleNamespace(after=lambda ms, func: None, after_cancel=lambda job: None))
+    return app
+
+
+def close_app(app):
+    app.writer.close()
+    app.processed_transactions.close()
+    app.summary.close()
+
+
+def bench_save_current_identifier(df, repeat, clicks=1000):
+    """
+    Simulates `clicks` Next clicks through save_current_identifier on a
+    BudgetTrackerGUI that has no window. The clicks are timed on their own
+    (what the event loop waits for) and together with draining the writes.
+    Each run switches the identifier so every click changes its row.
+    """
+    app = headless_app(df, "bench_clicks")
+    clicks = min(clicks, len(df))
+    identifiers = iter(['Groceries', 'Coffee'] * (2 * repeat))
+
+    def pick_identifier():
+        identifier = next(identifiers)
+        app.identifier_var = types.SimpleNamespace(get=lambda: identifier)
+
+    def run(_):
+        for position in range(clicks):
+            app.current_index = position
+            app.save_current_identifier()
+
+    def run_and_drain(_):
+        run(_)
+        app.writer.flush()
+
+    try:
+        clicks_only = best_of(repeat, run, pick_identifier)
+        app.writer.flush()
+        return {
+            f'save_current_identifier x{clicks}': clicks_only,
+            f'save_current_identifier x{clicks} + writes': best_of(repeat, run_and_drain, pick_identifier),
+        }
+    finally:
+        close_app(app)
+
+
+def bench_label_rows(df, repeat, rows=1000):
+    """
+    Labeling `rows` rows at once from the transaction grid, with the writes
+    drained. Each run switches the identifier so every row changes.
+    """
+    app = headless_app(df, "bench_bulk")
+    rows = min(rows, len(df))
+    identifiers = iter(['Groceries', 'Coffee'] * repeat)
+
+    def run(identifier):
+        app.label_rows(range(rows), identifier)
+        app.writer.flush()
+
+    try:
+        return {f'label_rows x{rows} + writes': best_of(repeat, run, lambda: next(identifiers))}
+    finally:
+        close_app(app)
+
+
+def bench_search(df, repeat):
+    """
+    Building the TransactionSearch index, and the queries the search window
+    runs while a description is being typed, with and without ranges.
+    """
+    def build(_):
+        sb.TransactionSearch(df)
+
+    search = sb.TransactionSearch(df)
+
+    def typing(_):
+        for text in ('a', 'al', 'ald', 'aldi'):
+            search.query(text)
+
+    def ranges(_):
+        search.query('sheetz', amount_min='10', amount_max='50', date_from='2023-01-01', date_to='2023-12-31')
+
+    return {
+        'build search index': best_of(repeat, build, lambda: None),
+        'search as you type x4': best_of(repeat, typing, lambda: None),
+        'search text + amount + date': best_of(repeat, ranges, lambda: None),
+    }
+
+
+def bench_suggest(df, repeat, queries=100):
+    """
+    Building the identifier suggestion index over every description, labeled
+    with a handful of identifiers, and `queries` suggestions for descriptions
+    the way the main window asks for them.
+    """
+    descriptions = df['Description'].astype(str).tolist()
+    identifiers = [SUGGEST_IDENTIFIERS[i % len(SUGGEST_IDENTIFIERS)] for i in range(len(descriptions))]
+
+    def build(_):
+        sb.IdentifierSuggester(descriptions, identifiers)
+
+    suggester = sb.IdentifierSuggester(descriptions, identifiers)
+    step = max(len(descriptions) // queries, 1)
+    sample = descriptions[::step][:queries]
+
+    def suggest(_):
+        for description in sample:
+            suggester.suggest(description, k=sb.SUGGESTION_COUNT)
+
+    return {
+        'build suggestion index': best_of(repeat, build, lambda: None),
+        f'suggest x{len(sample)}': best_of(repeat, suggest, lambda: None),
+    }
+
+
+def run_suite(sizes, key_counts, repeat, work_dir):
+    results = []
+
+    def record(name, seconds, rows, keys=None, budget=None):
+        result = {
+            'benchmark': name,
+            'rows': rows,
+            'mapping_keys': keys,
+            'seconds': round(seconds, 6),
+            'rows_per_second': round(rows / seconds) if seconds and rows else None,
+        }
+        if budget is not None:
+            result['budget_seconds'] = budget
+            result['within_budget'] = seconds <= budget
+        results.append(result)
+        label = name
+        if rows:
+            label += f" [{rows} rows" + (f", {keys} keys]" if keys else "]")
+        over = "  OVER BUDGET" if budget is not None and seconds > budget else ""
+        print(f"{label:<70} {seconds * 1000:>10.1f} ms{over}")
+
+    record('import stonestreetBudget', bench_import(repeat), 0, budget=IMPORT_BUDGET)
+    for rows in sizes:
+        csv_path = os.path.join(work_dir, f"export_{rows}.csv")
+        generate_transactions(rows).to_csv(csv_path, index=False)
+        record('first transaction ready', bench_first_transaction(csv_path, repeat), rows,
+               budget=FIRST_TRANSACTION_BUDGET.get(rows))
+        for name, seconds in bench_filter(csv_path, repeat).items():
+            record(name, seconds, rows)
+        df = load_frame(csv_path)
+        for keys in key_counts:
+            for name, seconds in bench_apply_mappings(df, generate_mappings(keys), repeat).items():
+                record(name, seconds, rows, keys)
+            for name, seconds in bench_add_mapping(df, generate_mappings(keys), repeat).items():
+                record(name, seconds, rows, keys)
+        for name, seconds in bench_add_custom_identifier(df, repeat).items():
+            record(name, seconds, rows)
+        for name, seconds in bench_processed_store(df, repeat).items():
+            record(name, seconds, rows)
+        for name, seconds in bench_save_current_identifier(df, repeat).items():
+            record(name, seconds, rows)
+        for name, seconds in bench_label_rows(df, repeat).items():
+            record(name, seconds, rows)
+        for name, seconds in bench_search(df, repeat).items():
+            record(name, seconds, rows)
+        for name, seconds in bench_suggest(df, repeat).items():
+            record(name, seconds, rows)
+    return results
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(results, out_dir=RESULTS_DIR):
+    commit = current_commit()
+    report = {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def compare(results, baseline_path):
+    """
+    Prints each benchmark's time relative to the same benchmark in an earlier run.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r['benchmark'], r['rows'], r['mapping_keys']): r['seconds'] for r in baseline['results']}
+    print(f"\nCompared with {baseline['commit']} ({baseline['timestamp']}):")
+    for r in results:
+        before = previous.get((r['benchmark'], r['rows'], r['mapping_keys']))
+        if before:
+            ratio = r['seconds'] / before
+            flag = "  REGRESSION" if ratio > 1.10 else ""
+            print(f"  {r['benchmark']} [{r['rows']} rows, {r['mapping_keys']} keys]: {ratio:.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark stonestreetBudget hot paths on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000],
+                        help="Export sizes in rows (add 1000000 for the full run)")
+    parser.add_argument("--keys", type=int, nargs="+", default=[10, 1000, 10000], help="Mapping file sizes")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--compare", metavar="RESULTS_JSON", help="Earlier results file to compare against")
+    parser.add_argument("--no-save", action="store_true", help="Do not write a results file")
+    args = parser.parse_args(argv)
+
+    previous_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix="stonestreet-bench-")
+    try:
+        # The tracker keeps its history, cache and processed store relative to the working directory
+        os.chdir(work_dir)
+        results = run_suite(args.sizes, args.keys, args.repeat, work_dir)
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if not args.no_save:
+        print(f"\nResults saved to {save_results(results)}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
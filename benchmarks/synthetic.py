@@ -0,0 +1,134 @@
+"""
+Synthetic bank exports and mapping files for the benchmarks.
+
+The generated CSVs have the columns stonestreetBudget expects
+('Transaction Date', 'Amount', 'Credit Debit Indicator', 'type',
+'Description', 'Category') and descriptions shaped like real exports, so
+mapping keys hit at a realistic rate.
+
+    python benchmarks/synthetic.py --rows 100000 --keys 1000 --out-dir bench_data
+"""
+import argparse
+import json
+import os
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+
+MERCHANTS = [
+    ("amazon", "Amazon", "Shopping"),
+    ("burn boot camp", "Burn Bootcamp", "Fitness"),
+    ("auto spa", "Car wash", "Auto"),
+    ("spotify", "Spotify", "Entertainment"),
+    ("mcdonald's", "Eating out", "Restaurants"),
+    ("aldi", "Groceries", "Groceries"),
+    ("weis markets", "Groceries", "Groceries"),
+    ("dunkin' donuts", "Eating out", "Restaurants"),
+    ("adobe", "Adobe", "Software"),
+    ("payment to t-mobile", "Phone", "Utilities"),
+    ("target", "Other", "Shopping"),
+    ("sheetz", "Fuel", "Auto"),
+    ("planet fitness", "Planet Fitness", "Personal Care"),
+    ("lost sock coffee", "Coffee", "Restaurants"),
+]
+TRANSFERS = [
+    ("transfer to savings -5398", "Savings"),
+    ("transfer to savings -5240", "Savings"),
+    ("transfer from venmo", "Ignore"),
+    ("transfer to venmo", "Ignore"),
+    ("transfer to checking -6718", "Ignore"),
+]
+CITIES = ["vista ca", "harrisburg pa", "dc", "seattle wa", "austin tx", "york pa"]
+SYLLABLES = ["ka", "lo", "mi", "ra", "zen", "tor", "vel", "qu", "ix", "bar", "sun", "mar", "po", "dex"]
+
+
+def _merchant_name(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def generate_transactions(rows, seed=0, start=date(2022, 1, 1), days=3 * 365, unmapped_merchants=500):
+    """
+    Returns a DataFrame of `rows` synthetic transactions spread over `days`
+    days from `start`. Roughly a third of the descriptions are not covered by
+    the known merchants, like the long tail of a real export.
+    """
+    rng = random.Random(seed)
+    tail = [_merchant_name(rng) for _ in range(unmapped_merchants)]
+    records = []
+    for _ in range(rows):
+        posted = start + timedelta(days=rng.randrange(days))
+        pick = rng.random()
+        if pick < 0.08:
+            description, _ = rng.choice(TRANSFERS)
+            description = description.upper()
+            category, indicator = "Transfers", rng.choice(["Debit", "Credit"])
+        elif pick < 0.10:
+            description, category, indicator = "#NAME?", "Rent", "Debit"
+        elif pick < 0.12:
+            description, category, indicator = "SALARY/REGULAR INCOME FROM EMPLOYER", "Income", "Credit"
+        elif pick < 0.65:
+            merchant, _, category = rng.choice(MERCHANTS)
+            description = f"DEBIT-DC {rng.randint(1000, 9999)} {merchant.upper()} #{rng.randint(1, 999)} {rng.choice(CITIES).upper()}"
+            indicator = "Debit"
+        else:
+            description = f"POS {rng.choice(tail).upper()} {rng.choice(CITIES).upper()}"
+            category, indicator = rng.choice(["Shopping", "Restaurants", "Other"]), "Debit"
+        amount = round(rng.lognormvariate(3, 1), 2)
+        if indicator == "Debit":
+            amount = -amount
+        records.append({
+            "Transaction Date": posted.strftime("%m/%d/%Y"),
+            "Amount": f"{amount:.2f}",
+            "Credit Debit Indicator": indicator,
+            "type": indicator.lower(),
+            "Description": description,
+            "Category": category,
+        })
+    return pd.DataFrame.from_records(records)
+
+
+def generate_mappings(keys, seed=0):
+    """
+    Returns a description -> identifier mapping with `keys` entries: the
+    known merchants and transfers first, then synthetic merchant names.
+    """
+    rng = random.Random(seed + 1)
+    mappings = {key: identifier for key, identifier, _ in MERCHANTS}
+    mappings.update(TRANSFERS)
+    identifiers = sorted({identifier for _, identifier, _ in MERCHANTS})
+    while len(mappings) < keys:
+        mappings[f"{_merchant_name(rng)} {rng.choice(CITIES)}"] = rng.choice(identifiers)
+    return dict(list(mappings.items())[:keys])
+
+
+def write_dataset(out_dir, rows, keys, seed=0):
+    """
+    Writes export_<rows>.csv and mappings_<keys>.json into out_dir and returns their paths.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    csv_path = os.path.join(out_dir, f"export_{rows}.csv")
+    mapping_path = os.path.join(out_dir, f"mappings_{keys}.json")
+    if not os.path.exists(csv_path):
+        generate_transactions(rows, seed=seed).to_csv(csv_path, index=False)
+    if not os.path.exists(mapping_path):
+        with open(mapping_path, "w") as f:
+            json.dump(generate_mappings(keys, seed=seed), f, indent=4)
+    return csv_path, mapping_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic bank exports and mapping files.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--keys", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default="bench_data")
+    args = parser.parse_args(argv)
+    for rows in args.rows:
+        for keys in args.keys:
+            for path in write_dataset(args.out_dir, rows, keys, seed=args.seed):
+                print(path)
+
+
+if __name__ == "__main__":
+    main()
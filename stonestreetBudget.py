@@ -1,52 +1,1223 @@
-import pandas as pd
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+import argparse
+import concurrent.futures
+import contextlib
+import functools
+import glob
+import hashlib
+import importlib
+import importlib.util
 import json
+import logging
+import math
 import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
 from datetime import datetime
 
+class _LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access, so
+    paths that never touch pandas or Tk do not pay for importing them.
+    """
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(importlib.import_module(self._name), attr)
+        setattr(self, attr, value)
+        return value
+
+np = _LazyModule('numpy')
+pd = _LazyModule('pandas')
+tk = _LazyModule('tkinter')
+ttk = _LazyModule('tkinter.ttk')
+messagebox = _LazyModule('tkinter.messagebox')
+filedialog = _LazyModule('tkinter.filedialog')
+
+def tk_available():
+    # Headless installs without Tk can still run the categorize command
+    return importlib.util.find_spec('tkinter') is not None
+
 csv_file = "phatstacks.csv"
 mapping_file = "description_identifier_mapping.json"
+processed_file = "processed_transactions.db"
+legacy_processed_file = "processed_transactions.csv"
+cache_dir = ".stonestreet_cache"
+history_dir = "transaction_history"
+summary_file = "budget_summary.db"
+metrics_dir = "session_metrics"
+# Where the session's metrics are written; None means metrics_dir/<session start>.json
+metrics_file = None
+
+logger = logging.getLogger("stonestreet")
+
+# Identifiers suggested for an unlabeled transaction
+SUGGESTION_COUNT = 3
+# Growth of the labeled collection after which the suggestion index is rebuilt
+SUGGESTION_NORM_REFRESH = 0.1
+# Trigrams present in more than this share of labeled descriptions are skipped when ranking
+SUGGESTION_MAX_DF = 0.5
+# How often the event loop checks whether the suggestion index is built
+SUGGESTER_POLL_MS = 50
+# Functions and allocation sites listed in each profiling report
+PROFILE_TOP_ENTRIES = 30
+# Rows rendered at a time in the transaction grid
+GRID_PAGE_ROWS = 30
+# Matches listed in the search window, and the typing pause before a search runs
+SEARCH_RESULT_ROWS = 200
+SEARCH_DELAY_MS = 150
+# Budget summary reports, and the window of the trailing one in months
+SUMMARY_REPORTS = ('trailing', 'monthly', 'yearly')
+SUMMARY_TRAILING_MONTHS = 12
+# Journal size at which edits are compacted into the transactions file
+JOURNAL_COMPACT_BYTES = 256 * 1024
+# Size limit for parsed frames kept in cache_dir
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Columns of a bank export that the tracker reads
+TRANSACTION_COLUMNS = ['Transaction Date', 'Amount', 'Credit Debit Indicator', 'type', 'Description', 'Category',
+                       'Account', 'Transfer Link', 'Custom Identifier']
+# Export columns with few distinct values, held as categoricals
+CATEGORICAL_COLUMNS = ['Credit Debit Indicator', 'type', 'Category', 'Account']
+# Columns computed from each row at load time and never written back
+DERIVED_COLUMNS = ['Normalized Description', 'Transaction Key']
+# Where the original text of dates and amounts that do not parse is kept, so
+# they are written back unchanged; added only when a file has such values
+UNPARSED_COLUMNS = {'Transaction Date': 'Unparsed Date', 'Amount': 'Unparsed Amount'}
+# Currency symbols, thousands separators and parentheses stripped from amounts that are not plain numbers
+AMOUNT_NOISE_PATTERN = r'[\s$€£¥,()]'
+# Date format for keys, and for writing dates whose source format was not detected
+ISO_DATE_FORMAT = '%Y-%m-%d'
+# Worker processes for parsing several exports at once; None means one per file, up to the CPU count
+INGEST_WORKERS = None
+# Fixed date formats tried, in order, before falling back to inference
+DATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%d', '%m/%d/%y', '%Y/%m/%d', '%d/%m/%Y', '%m-%d-%Y', '%Y-%m-%d %H:%M:%S']
+DATE_SAMPLE_SIZE = 200
+
+class SessionMetrics:
+    """
+    Timings and counters for one session, by pipeline stage. Stages time the
+    block they wrap (count, total and max seconds); counters are plain sums.
+    Both may be updated from the BackgroundWriter thread.
+
+    With profiling enabled, each outermost stage is also run under cProfile
+    and tracemalloc, and its reports are written to the profile directory as
+    <stage>-<n>.prof, <stage>-<n>.txt and <stage>-<n>.mem.txt.
+    """
+    def __init__(self):
+        self.started = datetime.now()
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.counters = {}
+        self.profile_dir = None
+        self.profiling = threading.Lock()  # held while a stage is being profiled
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        profiled = self.profile_dir is not None and self.profiling.acquire(blocking=False)
+        try:
+            if profiled:
+                with self._profile(name):
+                    yield
+            else:
+                start = time.perf_counter()
+                try:
+                    yield
+                finally:
+                    self._record(name, time.perf_counter() - start)
+        finally:
+            if profiled:
+                self.profiling.release()
+
+    def _record(self, name, seconds):
+        with self.lock:
+            timing = self.timings.setdefault(name, {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            timing['count'] += 1
+            timing['total_seconds'] += seconds
+            timing['max_seconds'] = max(timing['max_seconds'], seconds)
+        logger.debug("%s took %.1f ms", name, seconds * 1000)
+
+    @contextlib.contextmanager
+    def _profile(self, name):
+        import cProfile
+        import pstats
+        import tracemalloc
+        run = self.timings.get(name, {}).get('count', 0) + 1
+        stem = os.path.join(self.profile_dir, f"{name}-{run}")
+        profiler = cProfile.Profile()
+        before = tracemalloc.take_snapshot()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._record(name, time.perf_counter() - start)
+            after = tracemalloc.take_snapshot()
+            profiler.dump_stats(stem + ".prof")
+            with open(stem + ".txt", 'w') as f:
+                pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(PROFILE_TOP_ENTRIES)
+            with open(stem + ".mem.txt", 'w') as f:
+                for stat in after.compare_to(before, 'lineno')[:PROFILE_TOP_ENTRIES]:
+                    f.write(f"{stat}\n")
+
+    def enable_profiling(self, directory):
+        import tracemalloc
+        os.makedirs(directory, exist_ok=True)
+        self.profile_dir = directory
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'started': self.started.isoformat(timespec='seconds'),
+                'finished': datetime.now().isoformat(timespec='seconds'),
+                'timings': {name: dict(timing) for name, timing in self.timings.items()},
+                'counters': dict(self.counters),
+            }
+
+    def export(self, path=None):
+        """
+        Writes the session's metrics as JSON, by default to
+        metrics_dir/<session start>.json. Returns the path.
+        """
+        if path is None:
+            os.makedirs(metrics_dir, exist_ok=True)
+            path = os.path.join(metrics_dir, f"{self.started:%Y%m%d-%H%M%S}.json")
+        write_json_atomic(self.to_dict(), path)
+        return path
 
-def read_transactions(csv_path):
+metrics = SessionMetrics()
+
+def read_transactions(csv_path, columns=TRANSACTION_COLUMNS):
+    """
+    Reads the bank transactions from the CSV file with the typed schema (see
+    apply_transaction_schema). Only the given columns that the file has are
+    read; columns=None reads all of them.
+    Returns a pandas DataFrame, served typed from the parse cache when the file is unchanged.
+    """
+    read_kwargs = {'dtype': {'Transaction Date': str, 'Description': str, 'Transfer Link': str, 'Custom Identifier': str,
+                             **{column: 'category' for column in CATEGORICAL_COLUMNS}}}
+    if columns is not None:
+        header = pd.read_csv(csv_path, nrows=0).columns
+        read_kwargs['usecols'] = [column for column in columns if column in header]
+    # The cache holds the typed frame, derived columns included
+    return get_parse_cache().read_csv(csv_path, transform=apply_transaction_schema, **read_kwargs)
+
+def apply_transaction_schema(transactions_df):
     """
-    Reads the bank transactions from the CSV file.
-    Returns a pandas DataFrame.
+    Converts an export frame to the in-memory types: 'Transaction Date' as
+    datetime64 (the detected text format is kept in attrs['date_format'] so
+    the file is written back the same way), 'Amount' as nullable integer
+    cents and CATEGORICAL_COLUMNS as categoricals, then adds DERIVED_COLUMNS.
+    Dates and amounts that do not parse keep their text in UNPARSED_COLUMNS.
+    Typed columns are left alone.
     """
-    df = pd.read_csv(csv_path)
+    if 'Transaction Date' in transactions_df.columns and not pd.api.types.is_datetime64_any_dtype(transactions_df['Transaction Date']):
+        text = transactions_df['Transaction Date']
+        date_format = detect_date_format(text)
+        transactions_df['Transaction Date'] = parse_transaction_dates(text, date_format)
+        transactions_df.attrs['date_format'] = date_format or ISO_DATE_FORMAT
+        _keep_unparsed(transactions_df, 'Transaction Date', text)
+    # Cents are nullable Int64; an int64 column read from a file with whole amounts is still dollars
+    if 'Amount' in transactions_df.columns and not isinstance(transactions_df['Amount'].dtype, pd.Int64Dtype):
+        text = transactions_df['Amount']
+        transactions_df['Amount'] = amount_to_cents(text)
+        _keep_unparsed(transactions_df, 'Amount', text)
+    for column in CATEGORICAL_COLUMNS:
+        if column in transactions_df.columns and not isinstance(transactions_df[column].dtype, pd.CategoricalDtype):
+            transactions_df[column] = transactions_df[column].astype('category')
+    if {'Transaction Date', 'Description', 'Amount'}.issubset(transactions_df.columns) and 'Transaction Key' not in transactions_df.columns:
+        add_derived_columns(transactions_df)
+    return transactions_df
+
+def _keep_unparsed(transactions_df, column, text):
+    # Non-blank text whose typed value came out missing
+    unparsed = transactions_df[column].isna().to_numpy() & text.notna().to_numpy()
+    if unparsed.any():
+        unparsed &= (text.astype(str).str.strip() != '').to_numpy()
+    if unparsed.any():
+        transactions_df[UNPARSED_COLUMNS[column]] = text.astype(object).where(unparsed)
+
+def normalize_descriptions(descriptions):
+    # The one description normalization: str() per value, stripped and lowercased
+    return _as_text(descriptions).str.strip().str.lower()
+
+def description_column(transactions_df):
+    # Normalized descriptions of a frame, computed here only for frames loaded without them
+    if 'Normalized Description' in transactions_df.columns:
+        return transactions_df['Normalized Description']
+    return normalize_descriptions(transactions_df['Description'])
+
+def transaction_keys(dates, normalized_descriptions, cents):
+    """
+    Returns the canonical key of each transaction as a uint64 array: a hash
+    of its calendar day, normalized description and amount in cents that is
+    the same in every session. Rows agreeing on all three (a purchase
+    repeated on one day) share a key; missing dates and amounts hash alike.
+    """
+    missing = np.iinfo(np.int64).min
+    parts = pd.DataFrame({
+        'day': np.asarray(dates.to_numpy(), dtype='datetime64[D]').view(np.int64),
+        'description': normalized_descriptions.to_numpy(dtype=object),
+        'cents': cents.to_numpy(dtype='int64', na_value=missing),
+    })
+    return pd.util.hash_pandas_object(parts, index=False).to_numpy()
+
+def add_derived_columns(transactions_df):
+    """
+    Adds DERIVED_COLUMNS to a typed frame, column-wise. Matching, dedup and
+    processed tracking read these instead of normalizing strings again.
+    """
+    transactions_df['Normalized Description'] = normalize_descriptions(transactions_df['Description'])
+    transactions_df['Transaction Key'] = transaction_keys(
+        transactions_df['Transaction Date'], transactions_df['Normalized Description'], transactions_df['Amount']
+    )
+    return transactions_df
+
+def amount_to_cents(values):
+    """
+    Converts amounts (text or numbers) to nullable Int64 cents. Text that is
+    not a plain number is retried without currency symbols and thousands
+    separators, with '(12.50)' read as -12.50; what still fails is NA.
+    """
+    numbers = pd.to_numeric(values, errors='coerce')
+    failed = numbers.isna().to_numpy() & values.notna().to_numpy()
+    if failed.any():
+        text = values[failed].astype(str).str.strip()
+        retried = pd.to_numeric(text.str.replace(AMOUNT_NOISE_PATTERN, '', regex=True), errors='coerce')
+        negative = text.str.startswith('(') & text.str.endswith(')')
+        numbers = numbers.astype('float64')
+        numbers[failed] = retried.where(~negative, -retried).to_numpy()
+    return (numbers * 100).round().astype('Int64')
+
+def format_amount(cents):
+    if cents is None or pd.isna(cents):
+        return ''
+    cents = int(cents)
+    return f"{'-' if cents < 0 else ''}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+def format_amounts(cents):
+    """
+    Column-wise format_amount: integer cents to '-12.50' style text, '' when missing.
+    """
+    missing = cents.isna()
+    values = cents.fillna(0).astype('int64')
+    magnitude = values.abs()
+    text = (pd.Series(np.where(values < 0, '-', ''), index=cents.index)
+            + (magnitude // 100).astype(str) + '.' + (magnitude % 100).astype(str).str.zfill(2))
+    return text.mask(missing, '')
+
+def format_date(value, date_format=ISO_DATE_FORMAT):
+    if value is None or pd.isna(value) or value == '':
+        return ''
+    return pd.Timestamp(value).strftime(date_format)
+
+def format_dates(dates, date_format=ISO_DATE_FORMAT):
+    return dates.dt.strftime(date_format).fillna('')
+
+def display_value(field, value):
+    # Text shown for one field of a typed row
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    if field == 'Transaction Date':
+        return format_date(value)
+    if field == 'Amount':
+        return format_amount(value)
+    return str(value)
+
+def to_export_frame(transactions_df):
+    """
+    Returns a copy of a typed frame with dates and amounts as text again,
+    dates in the format the file was read with, and without DERIVED_COLUMNS.
+    Values that did not parse get their original text back.
+    """
+    df = transactions_df.drop(columns=DERIVED_COLUMNS, errors='ignore')
+    if 'Transaction Date' in df.columns and pd.api.types.is_datetime64_any_dtype(df['Transaction Date']):
+        df['Transaction Date'] = format_dates(df['Transaction Date'], transactions_df.attrs.get('date_format', ISO_DATE_FORMAT))
+    if 'Amount' in df.columns and pd.api.types.is_integer_dtype(df['Amount']):
+        df['Amount'] = format_amounts(df['Amount'])
+    for column, unparsed_column in UNPARSED_COLUMNS.items():
+        if unparsed_column in df.columns:
+            unparsed = df.pop(unparsed_column)
+            if column in df.columns:
+                df[column] = df[column].astype(object).where(unparsed.isna(), unparsed)
     return df
 
-def add_custom_identifier(transactions_df):
+def memory_report(transactions_df):
+    """
+    Returns the deep memory use of each column (column, dtype, bytes) with a
+    final 'Total' row.
+    """
+    usage = transactions_df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'column': list(usage.index) + ['Total'],
+        'dtype': [str(transactions_df[column].dtype) for column in usage.index] + [''],
+        'bytes': list(usage.to_numpy()) + [int(usage.sum())],
+    })
+    return report
+
+class ParseCache:
+    """
+    On-disk cache of parsed CSV frames in a columnar format (Parquet when
+    pyarrow or fastparquet is installed, pickle otherwise). Entries are keyed
+    by the file's content hash plus the read options; a manifest remembers the
+    hash for each path's size and mtime so unchanged files are not re-hashed.
+    The oldest entries are evicted once the directory exceeds max_bytes.
+    """
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or cache_dir
+        self.max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.manifest_path = os.path.join(self.directory, "manifest.json")
+        self.manifest = None
+
+    def _load_manifest(self):
+        if self.manifest is None:
+            try:
+                with open(self.manifest_path, 'r') as f:
+                    self.manifest = json.load(f)
+            except (OSError, ValueError):
+                self.manifest = {}
+        return self.manifest
+
+    def _save_manifest(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(temp_path, self.manifest_path)
+
+    @staticmethod
+    def content_hash(path):
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _entry_stem(self, path, read_kwargs):
+        """
+        Returns the cache file stem for path and read options, hashing the
+        file only when its size or mtime differ from the manifest.
+        """
+        stat = os.stat(path)
+        manifest = self._load_manifest()
+        source = os.path.abspath(path)
+        entry = manifest.get(source)
+        if not entry or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+            entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': self.content_hash(path)}
+            manifest[source] = entry
+            self._save_manifest()
+        options = hashlib.blake2b(repr(sorted(read_kwargs.items())).encode('utf-8'), digest_size=8).hexdigest()
+        return os.path.join(self.directory, f"{entry['hash']}-{options}")
+
+    def load(self, path, read_kwargs=None):
+        """
+        Returns the cached frame for path and read options, or None on a miss.
+        """
+        stem = self._entry_stem(path, read_kwargs or {})
+        for ext, reader in (('.parquet', pd.read_parquet), ('.pkl', pd.read_pickle)):
+            entry_path = stem + ext
+            if os.path.exists(entry_path):
+                try:
+                    df = reader(entry_path)
+                except Exception:
+                    os.remove(entry_path)
+                    continue
+                os.utime(entry_path)  # mark as recently used for eviction
+                return df
+        return None
+
+    def store(self, path, df, read_kwargs=None):
+        stem = self._entry_stem(path, read_kwargs or {})
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            df.to_parquet(stem + ".parquet", index=False)
+        except Exception:
+            # No Parquet engine installed, or columns it cannot encode
+            if os.path.exists(stem + ".parquet"):
+                os.remove(stem + ".parquet")
+            df.to_pickle(stem + ".pkl")
+        self.evict()
+
+    def read_csv(self, path, transform=None, **read_kwargs):
+        """
+        pd.read_csv(path, **read_kwargs) that skips parsing when the file is
+        cached. With a transform, transform(frame) is what is cached, under
+        its own key, so the work it does is skipped too.
+        """
+        options = dict(read_kwargs, transform=transform.__qualname__) if transform else read_kwargs
+        df = self.load(path, options)
+        if df is None:
+            df = pd.read_csv(path, **read_kwargs)
+            if transform:
+                df = transform(df)
+            self.store(path, df, options)
+        return df
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the cache fits in max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(('.parquet', '.pkl')):
+                entry_path = os.path.join(self.directory, name)
+                stat = os.stat(entry_path)
+                entries.append((stat.st_mtime, stat.st_size, entry_path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(entry_path)
+            total -= size
+
+_parse_cache = None
+
+def get_parse_cache():
+    global _parse_cache
+    if _parse_cache is None:
+        _parse_cache = ParseCache()
+    return _parse_cache
+
+# Rules for add_custom_identifier, checked in order; the first rule whose mask
+# is true for a row decides its identifier. Each mask receives a dict of the
+# lowercased 'description', 'category' and 'type' columns.
+CUSTOM_IDENTIFIER_RULES = [
+    ('Rent', lambda cols: (cols['description'] == '#name?') & (cols['category'] == 'rent')),
+    ('Planet Fitness', lambda cols: cols['category'] == 'personal care'),
+    # Existing example logic for custom identifier - user can customize this
+    ('GROCERY', lambda cols: cols['description'].str.contains('grocery', regex=False)),
+    ('RENT', lambda cols: cols['description'].str.contains('rent', regex=False)),
+    ('CREDIT', lambda cols: cols['type'] == 'credit'),
+    ('DEBIT', lambda cols: cols['type'] == 'debit'),
+]
+DEFAULT_CUSTOM_IDENTIFIER = 'OTHER'
+
+def _as_text(series):
+    # Same strings as str() per value, including 'nan' for missing values
+    return series.astype(str).fillna('nan')
+
+def _lowered_column(transactions_df, column):
+    if column not in transactions_df.columns:
+        return pd.Series('', index=transactions_df.index)
+    return _as_text(transactions_df[column]).str.lower()
+
+def add_custom_identifier(transactions_df, rules=None):
     """
     Adds a 'Custom Identifier' column to the DataFrame based on
-    the 'Description' and 'type' columns.
-    """
-    def identifier(row):
-        description = str(row['Description']).lower()
-        category = str(row.get('Category', '')).lower()
-        txn_type = str(row['type']).lower()
-
-        # Custom logic for specific cases
-        if description == '#name?' and category == 'rent':
-            return 'Rent'
-        elif category == 'personal care':
-            return 'Planet Fitness'
-
-        # Existing example logic for custom identifier - user can customize this
-        if 'grocery' in description:
-            return 'GROCERY'
-        elif 'rent' in description:
-            return 'RENT'
-        elif txn_type == 'credit':
-            return 'CREDIT'
-        elif txn_type == 'debit':
-            return 'DEBIT'
-        else:
-            return 'OTHER'
+    the 'Description', 'Category' and 'type' columns.
+    Each column is lowercased once and every rule is evaluated as a boolean
+    mask over the whole frame; rules earlier in the list take priority.
+    """
+    transactions_df['Custom Identifier'] = evaluate_custom_identifier_rules(transactions_df, rules)
+    return transactions_df
+
+def evaluate_custom_identifier_rules(transactions_df, rules=None):
+    """
+    Returns an array with the identifier of the first matching rule for each row.
+    """
+    if rules is None:
+        rules = CUSTOM_IDENTIFIER_RULES
+    if not rules:
+        return np.full(len(transactions_df), DEFAULT_CUSTOM_IDENTIFIER, dtype=object)
+    cols = {
+        'description': description_column(transactions_df),
+        'category': _lowered_column(transactions_df, 'Category'),
+        'type': _lowered_column(transactions_df, 'type'),
+    }
+    masks = [rule(cols).to_numpy(dtype=bool) for _, rule in rules]
+    identifiers = [identifier for identifier, _ in rules]
+    return np.select(masks, identifiers, default=DEFAULT_CUSTOM_IDENTIFIER)
+
+class MappingMatcher:
+    """
+    Aho-Corasick automaton over the keys of a description -> identifier mapping.
+    A description is labeled with the value of the first key (in mapping order)
+    that occurs anywhere in it, the same rule apply_mappings has always used.
+    """
+    def __init__(self, mappings):
+        self.keys = list(mappings.keys())
+        self.values = list(mappings.values())
+        # Node 0 is the root; each node has goto edges, a failure link and the
+        # lowest key rank that ends at it (or any of its suffixes)
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [None]
+        for rank, key in enumerate(self.keys):
+            node = 0
+            for ch in key:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.best.append(None)
+                node = nxt
+            if self.best[node] is None or rank < self.best[node]:
+                self.best[node] = rank
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for ch, child in self.goto[node].items():
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(ch, 0)
+                inherited = self.best[self.fail[child]]
+                if inherited is not None and (self.best[child] is None or inherited < self.best[child]):
+                    self.best[child] = inherited
+                queue.append(child)
+
+    def match_rank(self, text):
+        """
+        Returns the rank of the first mapping key found in text, or None.
+        """
+        goto, fail, best = self.goto, self.fail, self.best
+        found = best[0]  # an empty key matches everything
+        if found == 0:
+            return found
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            rank = best[state]
+            if rank is not None and (found is None or rank < found):
+                found = rank
+                if found == 0:
+                    break
+        return found
+
+    def label(self, descriptions):
+        """
+        Labels a Series of descriptions in one pass. Each distinct normalized
+        description is scanned once; the result is a Series aligned with
+        descriptions holding the mapped identifier, or NaN where nothing matched.
+        """
+        index = DescriptionIndex(normalize_descriptions(descriptions))
+        row_ranks = index.match(self)[index.codes]
+        matched = row_ranks != NO_MATCH_RANK
+        labels = np.full(len(row_ranks), None, dtype=object)
+        labels[matched] = np.asarray(self.values, dtype=object)[row_ranks[matched]]
+        return pd.Series(labels, index=descriptions.index, dtype=object)
+
+# Rank recorded for descriptions that no mapping key matches
+NO_MATCH_RANK = sys.maxsize
+
+class DescriptionIndex:
+    """
+    The distinct normalized descriptions of a frame (codes maps each row to
+    one), the rank of the mapping key each currently matches, and a trigram
+    inverted index built on first use. Adding a mapping key then only visits
+    the descriptions whose trigrams contain it.
+    """
+    def __init__(self, normalized_descriptions):
+        codes, uniques = pd.factorize(normalized_descriptions)
+        self.codes = codes
+        self.uniques = list(uniques)
+        self.match_ranks = np.full(len(self.uniques), NO_MATCH_RANK, dtype=np.int64)
+        self._postings = None
+
+    def match(self, matcher):
+        """
+        Records and returns the first-match rank of every distinct description.
+        """
+        self.match_ranks = np.fromiter(
+            (NO_MATCH_RANK if rank is None else rank for rank in map(matcher.match_rank, self.uniques)),
+            dtype=np.int64, count=len(self.uniques)
+        )
+        return self.match_ranks
+
+    def _trigram_postings(self):
+        """
+        Builds the trigram index once, over the UTF-8 bytes of the
+        descriptions: every distinct (trigram, description id) pair, sorted,
+        as two parallel arrays. The ids of one trigram are then a contiguous,
+        sorted slice found by binary search.
+        """
+        if self._postings is None:
+            encoded = [text.encode('utf-8') for text in self.uniques]
+            lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+            # Each description is followed by a NUL, and trigrams containing one are dropped
+            data = np.frombuffer(b'\0'.join(encoded) + b'\0', dtype=np.uint8).astype(np.int64)
+            owners = np.repeat(np.arange(len(encoded), dtype=np.int64), lengths + 1)
+            grams = data[:-2] << 16 | data[1:-1] << 8 | data[2:]
+            valid = (data[:-2] != 0) & (data[1:-1] != 0) & (data[2:] != 0)
+            pairs = np.sort(grams[valid] << 32 | owners[:-2][valid])
+            pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))[:len(pairs)]]
+            self._postings = (pairs >> 32, pairs & 0xFFFFFFFF)
+        return self._postings
+
+    def find(self, key):
+        """
+        Returns the ids of the distinct descriptions containing key.
+        """
+        if len(key) < 3:
+            return [unique_id for unique_id, text in enumerate(self.uniques) if key in text]
+        gram_codes, gram_ids = self._trigram_postings()
+        data = np.frombuffer(key.encode('utf-8'), dtype=np.uint8).astype(np.int64)
+        grams = data[:-2] << 16 | data[1:-1] << 8 | data[2:]
+        starts = np.searchsorted(gram_codes, grams, side='left')
+        stops = np.searchsorted(gram_codes, grams, side='right')
+        # Intersect from the rarest trigram up
+        order = np.argsort(stops - starts, kind='stable')
+        candidates = gram_ids[starts[order[0]]:stops[order[0]]]
+        for gram in order[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, gram_ids[starts[gram]:stops[gram]], assume_unique=True)
+        return [unique_id for unique_id in candidates.tolist() if key in self.uniques[unique_id]]
+
+    def rows_for(self, unique_ids):
+        """
+        Returns the row positions whose description is one of unique_ids.
+        """
+        return np.flatnonzero(np.isin(self.codes, unique_ids))
+
+    def add_mapping(self, key, rank):
+        """
+        Updates the recorded ranks for a mapping key at position rank and
+        returns the row positions it now labels: rows whose description
+        contains the key and is not already matched by an earlier key.
+        """
+        unique_ids = np.asarray(self.find(key), dtype=np.int64)
+        if len(unique_ids):
+            unique_ids = unique_ids[self.match_ranks[unique_ids] >= rank]
+            self.match_ranks[unique_ids] = rank
+        return self.rows_for(unique_ids)
+
+class TransactionSearch:
+    """
+    Prebuilt lookups over a frame whose rows do not change: the trigram index
+    of a DescriptionIndex for description substrings, and row positions
+    sorted by amount and by date so ranges are two binary searches. Amount
+    ranges match the size of the amount, debits and credits alike; date
+    ranges include both ends. Criteria are combined as boolean masks.
+    """
+    def __init__(self, transactions_df, description_index=None):
+        self.size = len(transactions_df)
+        self.description_index = description_index or DescriptionIndex(description_column(transactions_df))
+        self.description_index._trigram_postings()
+        cents = np.abs(transactions_df['Amount'].to_numpy(dtype='float64', na_value=np.nan))
+        # Missing amounts and dates sort last and are left out of every range
+        self.amount_order = np.argsort(cents, kind='stable')
+        self.sorted_amounts = cents[self.amount_order]
+        self.amount_count = int((~np.isnan(cents)).sum())
+        dates = transactions_df['Transaction Date'].to_numpy()
+        self.date_order = np.argsort(dates, kind='stable')
+        self.sorted_dates = dates[self.date_order]
+        self.date_count = int((~np.isnat(dates)).sum())
+
+    def _range_mask(self, order, sorted_values, count, low, high):
+        start = 0 if low is None else int(np.searchsorted(sorted_values[:count], low, side='left'))
+        stop = count if high is None else int(np.searchsorted(sorted_values[:count], high, side='right'))
+        mask = np.zeros(self.size, dtype=bool)
+        mask[order[start:max(start, stop)]] = True
+        return mask
+
+    def description_mask(self, text):
+        index = self.description_index
+        unique_mask = np.zeros(len(index.uniques), dtype=bool)
+        unique_mask[index.find(text.strip().lower())] = True
+        return unique_mask[index.codes] if len(index.codes) else np.zeros(0, dtype=bool)
+
+    def amount_mask(self, low=None, high=None):
+        # Bounds in dollars
+        low = None if low is None else round(abs(float(low)) * 100)
+        high = None if high is None else round(abs(float(high)) * 100)
+        # Debit bounds such as -50 to -10 are 5000 to 1000 as sizes
+        if low is not None and high is not None and low > high:
+            low, high = high, low
+        return self._range_mask(self.amount_order, self.sorted_amounts, self.amount_count, low, high)
+
+    def date_mask(self, start=None, end=None):
+        start = None if start is None else pd.Timestamp(start).normalize().to_datetime64()
+        # Everything on the end day, whatever its time
+        end = None if end is None else (pd.Timestamp(end).normalize() + pd.Timedelta(days=1, microseconds=-1)).to_datetime64()
+        return self._range_mask(self.date_order, self.sorted_dates, self.date_count, start, end)
+
+    def query(self, text='', amount_min=None, amount_max=None, date_from=None, date_to=None):
+        """
+        Returns the sorted row positions matching every given criterion;
+        empty or None criteria are ignored. Raises ValueError for an amount
+        or date that cannot be read.
+        """
+        mask = None
+        if text and text.strip():
+            mask = self.description_mask(text)
+        if amount_min is not None or amount_max is not None:
+            amounts = self.amount_mask(amount_min, amount_max)
+            mask = amounts if mask is None else mask & amounts
+        if date_from is not None or date_to is not None:
+            dates = self.date_mask(date_from, date_to)
+            mask = dates if mask is None else mask & dates
+        if mask is None:
+            return np.arange(self.size)
+        return np.flatnonzero(mask)
+
+@functools.lru_cache(maxsize=4)
+def _compile_mappings(items):
+    return MappingMatcher(dict(items))
+
+def get_mapping_matcher(mappings):
+    """
+    Returns the compiled MappingMatcher for this version of the mappings.
+    The automaton is only rebuilt when the mapping contents change.
+    """
+    return _compile_mappings(tuple(mappings.items()))
+
+def apply_mappings(transactions_df, mappings, description_index=None):
+    """
+    Sets 'Custom Identifier' on every transaction whose Description contains a
+    mapping key, leaving unmatched rows untouched. Returns the number of rows labeled.
+    Passing the frame's DescriptionIndex reuses it and records the match ranks
+    that apply_mapping_key needs later.
+    """
+    if transactions_df.empty or not mappings:
+        return 0
+    with metrics.stage('apply_mappings'):
+        if description_index is None:
+            description_index = DescriptionIndex(description_column(transactions_df))
+        matcher = get_mapping_matcher(mappings)
+        row_ranks = description_index.match(matcher)[description_index.codes]
+        matched = row_ranks != NO_MATCH_RANK
+        values = np.asarray(matcher.values, dtype=object)[row_ranks[matched]]
+        transactions_df.loc[matched, 'Custom Identifier'] = values
+    labeled = int(matched.sum())
+    metrics.count('rows_mapped', labeled)
+    return labeled
+
+def apply_mapping_key(transactions_df, mappings, key, description_index):
+    """
+    Applies one mapping key that was just added to (or changed in) mappings,
+    touching only the rows whose description contains it and that no earlier
+    key already matches. Returns the row positions that were labeled.
+    """
+    with metrics.stage('apply_mapping_key'):
+        rank = list(mappings).index(key)
+        positions = description_index.add_mapping(key, rank)
+        if len(positions):
+            column = transactions_df.columns.get_loc('Custom Identifier')
+            transactions_df.iloc[positions, column] = mappings[key]
+    metrics.count('rows_mapped', len(positions))
+    return positions
+
+def load_session_transactions(csv_path):
+    """
+    Loads a month of transactions the way BudgetTrackerGUI shows them: rows
+    with Description '#NAME?' are split off, only the relevant columns are
+    kept and 'Custom Identifier' is present with '' for blanks.
+    Returns (transactions, removed_rows).
+    """
+    with metrics.stage('load'):
+        transactions = read_transactions(csv_path)
+    metrics.count('rows_loaded', len(transactions))
+    attrs = dict(transactions.attrs)
+    # Remove rows with Description "#NAME?"
+    with metrics.stage('name_sweep'):
+        name_errors = transactions['Description'] == '#NAME?'
+        removed_rows = transactions[name_errors]
+        transactions = transactions[~name_errors]
+    metrics.count('name_rows_removed', len(removed_rows))
+    # Keep only relevant columns
+    relevant_columns = ['Transaction Date', 'Amount', 'Credit Debit Indicator', 'type', 'Description', 'Category']
+    # Add 'Account', 'Transfer Link' and 'Custom Identifier' if present; the identifier is created empty otherwise
+    relevant_columns += [column for column in ('Account', 'Transfer Link', 'Custom Identifier') if column in transactions.columns]
+    relevant_columns += [column for column in UNPARSED_COLUMNS.values() if column in transactions.columns]
+    relevant_columns += DERIVED_COLUMNS
+    transactions = transactions[relevant_columns].reset_index(drop=True)
+
+    # Add Custom Identifier column if not present
+    if 'Custom Identifier' not in transactions.columns:
+        transactions['Custom Identifier'] = ''
+
+    # Replace NaN or 'nan' strings with empty string in Custom Identifier column
+    transactions['Custom Identifier'] = transactions['Custom Identifier'].replace('nan', '').fillna('').astype(str)
+    transactions.attrs.update(attrs)
+    return transactions, removed_rows
 
-    transactions_df['Custom Identifier'] = transactions_df.apply(identifier, axis=1)
+def load_mapping_file(path=None):
+    """
+    Reads a description -> identifier mapping file, returning {} if it does not exist.
+    """
+    path = path or mapping_file
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_mapping_file(mappings, path=None):
+    with metrics.stage('save_mappings'):
+        write_json_atomic(mappings, path or mapping_file)
+
+def categorize_transactions(transactions_df, mappings, use_rules=True):
+    """
+    Runs the labeling pipeline without a display: existing identifiers are
+    kept, blanks are filled from CUSTOM_IDENTIFIER_RULES (unless use_rules is
+    False) and mapping matches override both, as they do when the tracker loads.
+    """
+    if 'Custom Identifier' in transactions_df.columns:
+        existing = transactions_df['Custom Identifier'].replace('nan', '').fillna('').astype(str)
+    else:
+        existing = pd.Series('', index=transactions_df.index)
+    if use_rules:
+        rule_labels = pd.Series(evaluate_custom_identifier_rules(transactions_df), index=transactions_df.index)
+        existing = existing.where(existing != '', rule_labels)
+    transactions_df['Custom Identifier'] = existing.astype(object)
+    apply_mappings(transactions_df, mappings)
     return transactions_df
 
+def build_transaction_index(transactions_df):
+    """
+    Maps each Transaction Key to the index labels of the rows that share it,
+    in frame order.
+    """
+    index = {}
+    for key, label in zip(transactions_df['Transaction Key'].tolist(), transactions_df.index):
+        index.setdefault(key, []).append(label)
+    return index
+
+class ProcessedTransactionStore:
+    """
+    SQLite-backed record of transactions that have already been processed,
+    keyed by Transaction Key (as a signed 64-bit integer, SQLite's only
+    kind), with the ISO date, normalized description and two-decimal amount
+    kept alongside for reading. Membership checks query the key instead of
+    loading the history.
+    The store may be shared with the BackgroundWriter thread; every method
+    holds the store's lock while it uses the connection.
+    """
+    def __init__(self, db_path=None, legacy_csv_path=None):
+        # legacy_csv_path None imports the default legacy CSV; '' imports none
+        self.db_path = db_path or processed_file
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS processed ("
+                "key INTEGER PRIMARY KEY, transaction_date TEXT NOT NULL, description TEXT NOT NULL, amount TEXT NOT NULL)"
+            )
+        if legacy_csv_path is None:
+            legacy_csv_path = legacy_processed_file
+        if legacy_csv_path:
+            self.migrate_csv(legacy_csv_path)
+
+    @staticmethod
+    def stored_key(key):
+        # Transaction Keys are unsigned; keys from 2**63 up are stored as negative numbers
+        key = int(key)
+        return key - (1 << 64) if key >= 1 << 63 else key
+
+    @staticmethod
+    def canonical_rows(transaction_dates, descriptions, amounts):
+        """
+        Returns stored rows for transactions as text, as processed_transactions.csv
+        held them (any date format and case, amounts like '-3.5'). Dates that
+        do not parse at all are stored as ''.
+        """
+        transaction_dates = transaction_dates.astype(str).str.strip().reset_index(drop=True)
+        dates = parse_transaction_dates(transaction_dates, detect_date_format(transaction_dates))
+        frame = pd.DataFrame({
+            'Transaction Date': dates,
+            'Description': descriptions.to_numpy(),
+            'Amount': amount_to_cents(amounts.astype(str).str.strip()).to_numpy(),
+        })
+        return ProcessedTransactionStore.rows_from_frame(add_derived_columns(frame))
+
+    @staticmethod
+    def row_for(row):
+        """
+        Returns the stored row (key, date, description, amount) for one typed row.
+        """
+        return (ProcessedTransactionStore.stored_key(row['Transaction Key']), format_date(row['Transaction Date']),
+                row['Normalized Description'], format_amount(row['Amount']))
+
+    @staticmethod
+    def rows_from_frame(transactions_df):
+        """
+        Returns the stored rows of every row in a typed frame, built column-wise.
+        """
+        return list(zip(
+            transactions_df['Transaction Key'].to_numpy(dtype=np.uint64).view(np.int64).tolist(),
+            format_dates(transactions_df['Transaction Date']).tolist(),
+            transactions_df['Normalized Description'].tolist(),
+            format_amounts(transactions_df['Amount']).tolist()
+        ))
+
+    def __contains__(self, key):
+        # key is a Transaction Key
+        with self.lock:
+            cursor = self.conn.execute("SELECT 1 FROM processed WHERE key = ?", (self.stored_key(key),))
+            return cursor.fetchone() is not None
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM processed").fetchone()[0]
+
+    def add(self, key, transaction_date, description, amount):
+        return self.add_many([(key, transaction_date, description, amount)])
+
+    def add_many(self, rows):
+        """
+        Inserts stored rows (see rows_from_frame) in a single transaction,
+        ignoring keys already stored. Returns the number of new rows.
+        """
+        with self.lock, metrics.stage('processed_store_write'):
+            before = self.conn.total_changes
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO processed (key, transaction_date, description, amount) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+            added = self.conn.total_changes - before
+        metrics.count('processed_keys_added', added)
+        return added
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM processed")
+
+    def backup(self, backup_path):
+        target = sqlite3.connect(backup_path)
+        try:
+            with self.lock:
+                self.conn.backup(target)
+        finally:
+            target.close()
+
+    def migrate_csv(self, csv_path):
+        """
+        Imports a processed_transactions.csv from before the store existed.
+        This runs once; the CSV itself is left in place. A CSV that cannot
+        be read is logged and left unmigrated, so the store still opens and
+        the import is retried once the file is fixed.
+        """
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'csv_migrated'").fetchone():
+            return
+        if os.path.exists(csv_path):
+            try:
+                legacy = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+            except (OSError, ValueError) as e:
+                logger.warning("Could not import processed transactions from '%s': %s", csv_path, e)
+                return
+            legacy = legacy.reindex(columns=['Transaction Date', 'Description', 'Amount'], fill_value='')
+            self.add_many(self.canonical_rows(legacy['Transaction Date'], legacy['Description'], legacy['Amount']))
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('csv_migrated', ?)", (datetime.now().isoformat(),))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def write_csv_atomic(transactions_df, path):
+    """
+    Writes the frame, as text (see to_export_frame), to path through a
+    temporary file that is fsynced and then renamed over the target, so a
+    crash never leaves a partial CSV.
+    """
+    temp_path = path + ".tmp"
+    with metrics.stage('save_csv'):
+        with open(temp_path, 'w', newline='', encoding='utf-8') as f:
+            to_export_frame(transactions_df).to_csv(f, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    metrics.count('rows_saved', len(transactions_df))
+
+def write_json_atomic(data, path):
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+class BackgroundWriter:
+    """
+    Runs write jobs on a single worker thread, in submission order, so the Tk
+    event loop never blocks on disk. A job submitted with a key supersedes a
+    queued job with the same key that has not started yet (only the latest
+    full rewrite of a file matters). Completion and errors are handed back to
+    the Tk thread by polling a result queue with after().
+    """
+    def __init__(self, master, on_status=None, poll_ms=50):
+        self.master = master
+        self.on_status = on_status
+        self.poll_ms = poll_ms
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.latest = {}  # key -> sequence number of the newest job with that key
+        self.sequence = 0
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="budget-writer", daemon=True)
+        self.thread.start()
+        self._poll_id = self.master.after(self.poll_ms, self._poll)
+
+    def submit(self, job, description, key=None, on_done=None):
+        """
+        Queues job() for the worker thread. on_done(result) runs on the Tk
+        thread once the job has finished successfully.
+        """
+        if self.closed:
+            raise RuntimeError("BackgroundWriter is closed")
+        with self.lock:
+            self.sequence += 1
+            self.pending += 1
+            if key is not None:
+                self.latest[key] = self.sequence
+            self.jobs.put((self.sequence, key, job, description, on_done))
+        self._report_status()
+
+    def _run(self):
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                self.jobs.task_done()
+                break
+            sequence, key, job, description, on_done = item
+            with self.lock:
+                superseded = key is not None and self.latest.get(key) != sequence
+            try:
+                if superseded:
+                    self.results.put((description, None, None, None))
+                else:
+                    self.results.put((description, job(), None, on_done))
+            except Exception as e:
+                self.results.put((description, None, e, None))
+            finally:
+                self.jobs.task_done()
+
+    def _drain_results(self):
+        while True:
+            try:
+                description, result, error, on_done = self.results.get_nowait()
+            except queue.Empty:
+                break
+            with self.lock:
+                self.pending -= 1
+            if error is not None:
+                messagebox.showerror("Error", f"Failed to {description}: {error}")
+            elif on_done is not None:
+                on_done(result)
+        self._report_status()
+
+    def _poll(self):
+        self._drain_results()
+        if not self.closed:
+            self._poll_id = self.master.after(self.poll_ms, self._poll)
+
+    def _report_status(self):
+        if self.on_status is not None:
+            self.on_status(self.pending)
+
+    def flush(self):
+        """
+        Blocks until every queued job has run and its callback has been called.
+        """
+        self.jobs.join()
+        self._drain_results()
+
+    def close(self):
+        """
+        Finishes all pending writes and stops the worker thread.
+        """
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        self.master.after_cancel(self._poll_id)
+        self.jobs.put(None)
+        self.thread.join()
+
+class ChangeJournal:
+    """
+    Append-only log of Custom Identifier edits to one transactions file, kept
+    next to it as <file>.journal with one JSON record per line:
+      {"key": [transaction key, occurrence], "old": ..., "new": ..., "ts": ...}
+      {"op": "clear", "ts": ...}          every identifier was cleared
+      {"op": "apply_mappings", "ts": ...} mappings were re-applied
+      {"op": "mapping", "mapping_key": ..., "ts": ...} one mapping key was added
+    The key is the row's Transaction Key plus which of the rows sharing it
+    was edited.
+    Compacting rewrites the file and empties the journal; replaying it on
+    load restores edits made since the last compaction.
+    """
+    def __init__(self, csv_path):
+        self.path = csv_path + ".journal"
+
+    def append(self, records):
+        lines = ''.join(json.dumps(record) + '\n' for record in records)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read(self):
+        records = []
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # A torn final line from a crash mid-append
+                        break
+        return records
+
+    def size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def compact(self, transactions_df, csv_path):
+        """
+        Writes the full frame to csv_path, then empties the journal. A crash in
+        between only means the journal is replayed onto edits it already holds.
+        """
+        write_csv_atomic(transactions_df, csv_path)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def replay_journal(transactions_df, records, transaction_index, mappings, description_index=None):
+    """
+    Re-applies journal records to a freshly loaded frame, in order. Returns
+    the number of records applied; keys no longer in the frame are skipped.
+    """
+    applied = 0
+    for record in records:
+        op = record.get('op')
+        if op == 'clear':
+            transactions_df['Custom Identifier'] = ''
+        elif op == 'apply_mappings':
+            apply_mappings(transactions_df, mappings, description_index)
+        elif op == 'mapping':
+            if description_index is None:
+                description_index = DescriptionIndex(description_column(transactions_df))
+                description_index.match(get_mapping_matcher(mappings))
+            if record['mapping_key'] in mappings:
+                apply_mapping_key(transactions_df, mappings, record['mapping_key'], description_index)
+        else:
+            key, occurrence = record['key']
+            labels = transaction_index.get(key, [])
+            if occurrence >= len(labels):
+                continue
+            transactions_df.at[labels[occurrence], 'Custom Identifier'] = record['new']
+        applied += 1
+    return applied
+
 class DateFilterGUI:
     def __init__(self, master):
         self.master = master
@@ -56,6 +1227,7 @@ class DateFilterGUI:
         self.selected_month = None
         self.selected_year = None
         self.selected_file = None
+        self.selected_files = []
         self.proceed = False
         
         self.create_widgets()
@@ -131,139 +1303,937 @@ class DateFilterGUI:
 
     def browse_file(self):
         global csv_file
-        filename = filedialog.askopenfilename(
-            title="Select CSV File",
+        # Several exports (e.g. one per account) can be selected and are ingested together
+        filenames = filedialog.askopenfilenames(
+            title="Select CSV File(s)",
             filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
         )
-        if filename:
-            self.selected_file = filename
-            csv_file = filename  # Update the global csv_file variable
+        if filenames:
+            self.selected_files = list(filenames)
+            self.selected_file = self.selected_files[0]
+            csv_file = self.selected_file  # Update the global csv_file variable
             # Show only the filename, not the full path
-            display_name = os.path.basename(filename)
+            if len(self.selected_files) == 1:
+                display_name = os.path.basename(self.selected_file)
+            else:
+                display_name = f"{len(self.selected_files)} files selected"
             self.file_label.config(text=display_name)
 
-def filter_transactions_by_date(month, year):
+def detect_date_format(values, formats=None):
+    """
+    Returns the first of DATE_FORMATS that parses every value in a sample of
+    the given date strings, or None if no fixed format fits.
+    """
+    sample = values.dropna().head(DATE_SAMPLE_SIZE).astype(str).str.strip()
+    if sample.empty:
+        return None
+    for date_format in formats or DATE_FORMATS:
+        if pd.to_datetime(sample, format=date_format, errors='coerce').notna().all():
+            return date_format
+    return None
+
+def parse_transaction_dates(values, date_format=None):
+    """
+    Parses date strings with a fixed format when one is known, and infers
+    the format of each value otherwise or where the fixed one does not fit
+    (a format change after the sampled rows). Unparseable dates become NaT.
+    Each distinct string is parsed once; exports repeat the same few dates.
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques)
+    if date_format:
+        parsed = pd.to_datetime(uniques, format=date_format, errors='coerce')
+        failed = parsed.isna()
+        if failed.any():
+            parsed[failed] = pd.to_datetime(uniques[failed], format='mixed', errors='coerce')
+    else:
+        parsed = pd.to_datetime(uniques, format='mixed', errors='coerce')
+    dates = parsed.to_numpy().take(codes)
+    if (codes == -1).any():
+        dates[codes == -1] = np.datetime64('NaT')
+    return pd.Series(dates, index=values.index, name=values.name)
+
+def transaction_hashes(transactions_df, dates, real_accounts=None):
+    """
+    Returns one uint64 per row of a raw export frame, hashing its
+    transaction_keys key together with which of the rows sharing that key it
+    is, so rows are matched between exports and partitions with a single
+    vectorized isin while genuinely repeated transactions stay apart.
+    real_accounts marks the rows whose 'Account' is known (see ingest_many)
+    rather than a file name; their account is hashed too, so the same charge
+    on two accounts stays apart. None hashes no row's account.
+    """
+    keys = pd.DataFrame({'key': transaction_keys(
+        dates, normalize_descriptions(transactions_df['Description']), amount_to_cents(transactions_df['Amount'])
+    )})
+    keys['account'] = ''
+    if real_accounts is not None and 'Account' in transactions_df.columns:
+        accounts = transactions_df['Account'].astype(object).fillna('').astype(str).str.strip().to_numpy()
+        keys['account'] = np.where(np.asarray(real_accounts, dtype=bool), accounts, '')
+    keys['occurrence'] = keys.groupby(['key', 'account']).cumcount()
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+def account_name(source_path):
+    # Exports without an 'Account' column are attributed to their file name
+    return os.path.splitext(os.path.basename(source_path))[0]
+
+def _read_export(source_path, use_cache=False):
+    """
+    Parses one export for TransactionHistory.ingest_many, in a worker process
+    when several are read at once. Returns (content hash, frame of the
+    tracker's columns as raw strings, so partitions keep the export's
+    formatting). Only the calling process may use the parse cache.
+    """
+    content_hash = ParseCache.content_hash(source_path)
+    header = pd.read_csv(source_path, nrows=0).columns
+    usecols = [column for column in header if column.strip() in TRANSACTION_COLUMNS]
+    read_kwargs = {'usecols': usecols, 'dtype': str}
+    if use_cache:
+        df = get_parse_cache().read_csv(source_path, **read_kwargs)
+    else:
+        df = pd.read_csv(source_path, **read_kwargs)
+    df.columns = [column.strip() for column in df.columns]
+    return content_hash, df
+
+def link_transfers(transactions_df, dates):
+    """
+    Gives both legs of a transfer between two accounts the same 'Transfer
+    Link': a row leaving one account and a row entering another on the same
+    day for the same amount, both described as a transfer. Rows that are
+    already linked keep their link. Returns the number of new links.
+    """
+    if 'Account' not in transactions_df.columns:
+        return 0
+    if 'Transfer Link' not in transactions_df.columns:
+        transactions_df['Transfer Link'] = ''
+    # A partition from a single account has nothing to link
+    if transactions_df['Account'].nunique() < 2:
+        return 0
+    links = transactions_df['Transfer Link'].fillna('')
+    cents = amount_to_cents(transactions_df['Amount'])
+    candidates = (
+        normalize_descriptions(transactions_df['Description']).str.contains('transfer', regex=False)
+        & cents.fillna(0).ne(0).to_numpy()
+        & transactions_df['Account'].notna()
+        & (links == '')
+    )
+    if transactions_df['Account'][candidates].nunique() < 2:
+        return 0
+    legs = pd.DataFrame({
+        'date': format_dates(dates),
+        'cents': cents.abs(),
+        'account': transactions_df['Account'].astype(str),
+        'outgoing': cents < 0,
+    })[candidates.to_numpy()]
+    if legs.empty:
+        return 0
+    # The nth transfer of an amount out of one account pairs with the nth into another
+    legs['n'] = legs.groupby(['date', 'cents', 'account', 'outgoing']).cumcount()
+    outgoing = legs[legs['outgoing']].drop(columns='outgoing').reset_index()
+    incoming = legs[~legs['outgoing']].drop(columns='outgoing').reset_index()
+    pairs = outgoing.merge(incoming, on=['date', 'cents', 'n'], suffixes=('_out', '_in'))
+    pairs = pairs[pairs['account_out'] != pairs['account_in']]
+    pairs = pairs.drop_duplicates('index_out').drop_duplicates('index_in')
+    if pairs.empty:
+        return 0
+    link_hashes = pd.util.hash_pandas_object(pairs[['date', 'cents', 'account_out', 'account_in', 'n']], index=False)
+    link_ids = [f"T{value:016x}" for value in link_hashes.to_numpy()]
+    transactions_df.loc[pairs['index_out'].to_numpy(), 'Transfer Link'] = link_ids
+    transactions_df.loc[pairs['index_in'].to_numpy(), 'Transfer Link'] = link_ids
+    return len(pairs)
+
+class TransactionHistory:
+    """
+    Transaction history partitioned by year and month, one CSV per month
+    under <directory>/<YYYY>/<MM>.csv. Each export is ingested once (tracked
+    by content hash); opening a month then reads only its partition.
+    """
+    def __init__(self, directory=None):
+        self.directory = directory or history_dir
+        self.manifest_path = os.path.join(self.directory, "ingested.json")
+
+    def partition_path(self, year, month):
+        return os.path.join(self.directory, f"{int(year):04d}", f"{int(month):02d}.csv")
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(temp_path, self.manifest_path)
+
+    def read_partition(self, year, month):
+        """
+        Returns the partition for a month with every column as raw strings,
+        or None if nothing has been ingested for it.
+        """
+        path = self.partition_path(year, month)
+        if not os.path.exists(path):
+            return None
+        return pd.read_csv(path, dtype=str)
+
+    def labeled_descriptions(self, exclude_path=None):
+        """
+        Returns the Description and Custom Identifier of every labeled row in
+        the history, skipping the partition at exclude_path.
+        """
+        frames = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "*", "*.csv"))):
+            if exclude_path and os.path.abspath(path) == os.path.abspath(exclude_path):
+                continue
+            header = pd.read_csv(path, nrows=0).columns
+            if 'Custom Identifier' not in header:
+                continue
+            df = pd.read_csv(path, usecols=['Description', 'Custom Identifier'], dtype=str).dropna()
+            frames.append(df[df['Custom Identifier'] != ''])
+        if not frames:
+            return pd.DataFrame(columns=['Description', 'Custom Identifier'])
+        return pd.concat(frames, ignore_index=True)
+
+    def ingest(self, source_path, account=None):
+        """
+        Adds an export to the history, merging each month into its partition
+        without duplicating rows already there. Returns the number of rows in
+        the export; an export that was ingested before is not read again.
+        """
+        return self.ingest_many([source_path], [account])
+
+    def ingest_many(self, source_paths, accounts=None, workers=None):
+        """
+        Adds several exports, e.g. overlapping date ranges from different
+        accounts, to the history. The exports are parsed in a process pool,
+        brought to one schema (the tracker's columns plus 'Account', taken
+        from the export, the accounts given per file or else the file name)
+        and deduplicated against each other and the partitions by row hash;
+        transfers between the accounts are then linked (see link_transfers).
+        Only accounts from the export or given per file are real enough to
+        tell rows apart: overlapping exports of one account saved under two
+        names still deduplicate. Returns the total number of rows in the
+        exports.
+        """
+        accounts = list(accounts or [None] * len(source_paths))
+        manifest = self._load_manifest()
+        total_count = 0
+        pending = []
+        for source_path, account in zip(source_paths, accounts):
+            entry = manifest.get(ParseCache.content_hash(source_path))
+            if entry is not None:
+                total_count += entry['rows']
+            else:
+                pending.append((source_path, account))
+        if not pending:
+            return total_count
+
+        with metrics.stage('ingest_parse'):
+            if len(pending) == 1:
+                parsed = [_read_export(pending[0][0], use_cache=True)]
+            else:
+                max_workers = workers or INGEST_WORKERS or min(len(pending), os.cpu_count() or 1)
+                with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as pool:
+                    parsed = list(pool.map(_read_export, [path for path, _ in pending]))
+
+        frames = []
+        hashes = []
+        date_format = None
+        for (source_path, account), (content_hash, df) in zip(pending, parsed):
+            if account:
+                real = np.ones(len(df), dtype=bool)
+            elif 'Account' in df.columns:
+                real = df['Account'].notna().to_numpy()
+            else:
+                real = np.zeros(len(df), dtype=bool)
+            if 'Account' not in df.columns:
+                df['Account'] = account or account_name(source_path)
+            else:
+                df['Account'] = df['Account'].fillna(account or account_name(source_path))
+            export_format = detect_date_format(df['Transaction Date'])
+            dates = parse_transaction_dates(df['Transaction Date'], export_format)
+            # Partitions keep the first export's date format
+            if date_format is None:
+                date_format = export_format
+            elif export_format != date_format:
+                df['Transaction Date'] = dates.dt.strftime(date_format or ISO_DATE_FORMAT)
+            frames.append((df, dates, real))
+            hashes.append(transaction_hashes(df, dates, real))
+            total_count += len(df)
+            manifest[content_hash] = {
+                'path': os.path.abspath(source_path),
+                'rows': len(df),
+                'ingested_at': datetime.now().isoformat()
+            }
+
+        combined = pd.concat([df for df, _, _ in frames], ignore_index=True)
+        combined_dates = pd.concat([dates for _, dates, _ in frames], ignore_index=True)
+        combined_real = np.concatenate([real for _, _, real in frames])
+        # A row repeated in overlapping exports keeps its first copy
+        unique = ~pd.Series(np.concatenate(hashes)).duplicated().to_numpy()
+        metrics.count('duplicates_removed', int((~unique).sum()))
+        combined = combined[unique]
+        combined_dates = combined_dates[unique]
+        combined_real = pd.Series(combined_real[unique], index=combined.index)
+
+        for (year, month), rows in combined.groupby([combined_dates.dt.year, combined_dates.dt.month]):
+            self._merge_partition(int(year), int(month), rows.reset_index(drop=True),
+                                  combined_dates[rows.index].reset_index(drop=True),
+                                  combined_real[rows.index].to_numpy(), date_format)
+
+        self._save_manifest(manifest)
+        return total_count
+
+    def _merge_partition(self, year, month, new_rows, new_dates, real_accounts, date_format=None):
+        existing = self.read_partition(year, month)
+        if existing is not None and not existing.empty:
+            existing_format = detect_date_format(existing['Transaction Date'])
+            existing_dates = parse_transaction_dates(existing['Transaction Date'], existing_format)
+            # Rows with a real account match stored rows of that account; the
+            # rest match stored rows of any account (partitions do not record
+            # which accounts were file names, nor had an 'Account' at first)
+            duplicate = np.isin(transaction_hashes(new_rows, new_dates), transaction_hashes(existing, existing_dates))
+            if 'Account' in existing.columns and real_accounts.any():
+                by_account = np.isin(transaction_hashes(new_rows, new_dates, real_accounts),
+                                     transaction_hashes(existing, existing_dates, np.ones(len(existing), dtype=bool)))
+                duplicate = np.where(real_accounts, by_account, duplicate)
+            new_rows = new_rows[~duplicate]
+            if new_rows.empty:
+                return
+            if existing_format and existing_format != date_format:
+                new_rows = new_rows.assign(**{'Transaction Date': new_dates[new_rows.index].dt.strftime(existing_format)})
+            merged = pd.concat([existing, new_rows], ignore_index=True)
+            merged_dates = pd.concat([existing_dates, new_dates[new_rows.index]], ignore_index=True)
+        else:
+            merged = new_rows
+            merged_dates = new_dates
+        metrics.count('transfers_linked', link_transfers(merged, merged_dates))
+        path = self.partition_path(year, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        merged.to_csv(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+
+class IdentifierSuggester:
+    """
+    Suggests identifiers for a description from descriptions that already
+    have one, ranked by cosine similarity of TF-IDF vectors over the UTF-8
+    byte trigrams of the description. Labeled descriptions are indexed in
+    bulk into sorted numpy postings (trigram -> doc ids and normalized
+    weights), so a query is a few binary searches and one bincount.
+    Descriptions labeled one at a time go to a small delta that is searched
+    alongside, and everything is reindexed, with fresh IDF weights, once the
+    delta has grown by SUGGESTION_NORM_REFRESH of the indexed collection.
+    """
+    def __init__(self, descriptions=(), identifiers=()):
+        self.doc_ids = {}           # normalized description -> doc id
+        self.texts = []             # doc id -> normalized description
+        self.identifier_codes = {}  # identifier -> code
+        self.identifier_names = []
+        # Docs below self.indexed are in the numpy postings, the rest in the delta
+        self.indexed = 0
+        self.doc_labels = np.empty(0, dtype=np.int64)  # doc id -> identifier code, -1 once cleared
+        self.gram_codes = np.empty(0, dtype=np.int64)
+        self.gram_idf = np.empty(0, dtype=np.float64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.posting_docs = np.empty(0, dtype=np.int64)
+        self.posting_weights = np.empty(0, dtype=np.float64)
+        self.delta_labels = []
+        self.delta_postings = {}    # trigram -> list of (doc id, weight)
+        self.add_many(descriptions, identifiers)
+
+    @staticmethod
+    def normalize(description):
+        return ' '.join(str(description).lower().split())
+
+    @staticmethod
+    def trigrams(texts):
+        """
+        Returns the (text number, trigram code) of every trigram of texts,
+        each padded with a space on both sides.
+        """
+        encoded = [f" {text} ".encode('utf-8') for text in texts]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        # Each text is followed by a NUL, and trigrams containing one are dropped
+        data = np.frombuffer(b'\0'.join(encoded) + b'\0', dtype=np.uint8).astype(np.int64)
+        owners = np.repeat(np.arange(len(encoded), dtype=np.int64), lengths + 1)
+        grams = data[:-2] << 16 | data[1:-1] << 8 | data[2:]
+        valid = (data[:-2] != 0) & (data[1:-1] != 0) & (data[2:] != 0)
+        return owners[:-2][valid], grams[valid]
+
+    def _label(self, identifier):
+        if not identifier:
+            return -1
+        code = self.identifier_codes.get(identifier)
+        if code is None:
+            code = self.identifier_codes[identifier] = len(self.identifier_names)
+            self.identifier_names.append(identifier)
+        return code
+
+    def _idf(self, grams):
+        # IDF of the last reindex; trigrams it did not see count as found in no doc
+        positions = np.searchsorted(self.gram_codes, grams).clip(max=max(len(self.gram_codes) - 1, 0))
+        found = (self.gram_codes[positions] == grams) if len(self.gram_codes) else np.zeros(len(grams), dtype=bool)
+        idf = np.full(len(grams), math.log(1 + self.indexed) + 1)
+        idf[found] = self.gram_idf[positions[found]]
+        return idf, positions, found
+
+    def add(self, description, identifier):
+        """
+        Records (or updates) the identifier for a labeled description.
+        """
+        self.add_many([description], [identifier])
+
+    def add_many(self, descriptions, identifiers):
+        """
+        Records the identifiers for many descriptions; a description listed
+        more than once keeps its last identifier. Descriptions not indexed
+        yet are skipped when that identifier is empty.
+        """
+        latest = {}
+        for description, identifier in dict(zip(descriptions, identifiers)).items():
+            latest[self.normalize(description)] = identifier
+        new_texts = []
+        for text, identifier in latest.items():
+            doc_id = self.doc_ids.get(text)
+            if doc_id is None:
+                if identifier:
+                    new_texts.append(text)
+            elif doc_id < self.indexed:
+                self.doc_labels[doc_id] = self._label(identifier)
+            else:
+                self.delta_labels[doc_id - self.indexed] = self._label(identifier)
+        if not new_texts:
+            return
+        for text in new_texts:
+            self.doc_ids[text] = len(self.texts)
+            self.texts.append(text)
+        labels = [self._label(latest[text]) for text in new_texts]
+        if len(self.texts) - self.indexed > SUGGESTION_NORM_REFRESH * self.indexed:
+            self._reindex(np.concatenate((self.doc_labels, np.asarray(self.delta_labels + labels, dtype=np.int64))))
+        else:
+            self._add_to_delta(new_texts, labels)
+
+    @classmethod
+    def _term_counts(cls, texts):
+        """
+        Returns the distinct (trigram, text number) pairs of texts, sorted by
+        trigram, and how often each pair occurs.
+        """
+        owners, grams = cls.trigrams(texts)
+        pairs = np.sort(grams << 32 | owners)
+        starts = np.flatnonzero(np.concatenate(([True], pairs[1:] != pairs[:-1]))[:len(pairs)])
+        counts = np.diff(np.append(starts, len(pairs)))
+        pairs = pairs[starts]
+        return pairs >> 32, pairs & 0xFFFFFFFF, counts
+
+    def _add_to_delta(self, texts, labels):
+        grams, docs, counts = self._term_counts(texts)
+        weights = counts * self._idf(grams)[0]
+        norms = np.sqrt(np.bincount(docs, weights=weights ** 2, minlength=len(texts)))
+        norms[norms == 0] = 1.0
+        weights /= norms[docs]
+        first_doc = self.indexed + len(self.delta_labels)
+        for gram, doc_id, weight in zip(grams.tolist(), (docs + first_doc).tolist(), weights.tolist()):
+            self.delta_postings.setdefault(gram, []).append((doc_id, weight))
+        self.delta_labels.extend(labels)
+
+    def _reindex(self, labels):
+        """
+        Indexes every doc into the numpy postings; the runs of a trigram in
+        the sorted (trigram, doc) pairs are its postings.
+        """
+        doc_count = len(self.texts)
+        pair_grams, docs, counts = self._term_counts(self.texts)
+        gram_starts = np.flatnonzero(np.concatenate(([True], pair_grams[1:] != pair_grams[:-1]))[:len(docs)])
+        offsets = np.append(gram_starts, len(docs))
+        doc_freq = np.diff(offsets)
+        idf = np.log((1 + doc_count) / (1 + doc_freq)) + 1
+        weights = counts * np.repeat(idf, doc_freq)
+        norms = np.sqrt(np.bincount(docs, weights=weights ** 2, minlength=doc_count))
+        norms[norms == 0] = 1.0
+        self.indexed = doc_count
+        self.doc_labels = labels
+        self.gram_codes = pair_grams[gram_starts]
+        self.gram_idf = idf
+        self.offsets = offsets
+        self.posting_docs = docs
+        self.posting_weights = weights / norms[docs]
+        self.delta_labels = []
+        self.delta_postings = {}
+
+    def suggest(self, description, k=5):
+        """
+        Returns up to k (identifier, score) pairs, best first. Each identifier
+        scores the similarity of its closest labeled description.
+        """
+        if not self.texts or k <= 0:
+            return []
+        grams, counts = np.unique(self.trigrams([self.normalize(description)])[1], return_counts=True)
+        idf, positions, found = self._idf(grams)
+        weights = counts * idf
+        query_norm = np.sqrt((weights ** 2).sum()) or 1.0
+        weights /= query_norm
+        best = np.zeros(len(self.identifier_names))
+        # Trigrams found in most descriptions add little but cost the most; skip them
+        found = np.flatnonzero(found)
+        starts = self.offsets[positions[found]]
+        stops = self.offsets[positions[found] + 1]
+        if len(found) > 1:
+            rare = stops - starts <= SUGGESTION_MAX_DF * self.indexed
+            found, starts, stops = found[rare], starts[rare], stops[rare]
+        if len(found):
+            lengths = stops - starts
+            postings = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            scores = np.bincount(self.posting_docs[postings],
+                                 weights=self.posting_weights[postings] * np.repeat(weights[found], lengths))
+            docs = np.flatnonzero(scores)
+            labels = self.doc_labels[docs]
+            labeled = labels >= 0
+            np.maximum.at(best, labels[labeled], scores[docs[labeled]])
+        if self.delta_postings:
+            delta_scores = {}
+            for gram, weight in zip(grams.tolist(), weights.tolist()):
+                for doc_id, doc_weight in self.delta_postings.get(gram, ()):
+                    delta_scores[doc_id] = delta_scores.get(doc_id, 0.0) + weight * doc_weight
+            for doc_id, score in delta_scores.items():
+                label = self.delta_labels[doc_id - self.indexed]
+                if label >= 0 and score > best[label]:
+                    best[label] = score
+        candidates = np.flatnonzero(best > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-best[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-best[candidates], kind='stable')]
+        return [(self.identifier_names[code], float(best[code])) for code in candidates.tolist()]
+
+def build_suggester(labeled, exclude_path=None):
+    """
+    Returns an IdentifierSuggester over the labeled rows of the partitioned
+    history, except the partition at exclude_path, and labeled (the loaded
+    month's 'Normalized Description' and 'Custom Identifier'), which takes
+    precedence.
+    """
+    with metrics.stage('startup.build_suggester'):
+        try:
+            history = TransactionHistory().labeled_descriptions(exclude_path=exclude_path)
+        except Exception as e:
+            logger.warning("Could not read labeled history for suggestions: %s", e)
+            history = pd.DataFrame(columns=['Description', 'Custom Identifier'])
+        return IdentifierSuggester(
+            history['Description'].tolist() + labeled['Normalized Description'].tolist(),
+            history['Custom Identifier'].tolist() + labeled['Custom Identifier'].tolist()
+        )
+
+def summary_contributions(transactions_df):
+    """
+    Returns the (year, month, identifier, cents) of the rows that count in
+    the budget summary: labeled rows with a date and an amount, except the
+    incoming leg of a linked transfer, so a transfer is counted once.
     """
-    Filter transactions in the selected CSV file to keep only those in the specified month and year.
+    if 'Custom Identifier' not in transactions_df.columns:
+        return pd.DataFrame(columns=['year', 'month', 'identifier', 'cents'])
+    identifiers = transactions_df['Custom Identifier'].fillna('').astype(str)
+    dates = transactions_df['Transaction Date']
+    cents = transactions_df['Amount']
+    counted = (identifiers != '') & dates.notna() & cents.notna()
+    if 'Transfer Link' in transactions_df.columns:
+        linked = transactions_df['Transfer Link'].fillna('').astype(str) != ''
+        counted &= ~(linked & (cents.fillna(0) > 0))
+    counted = counted.to_numpy(dtype=bool)
+    return pd.DataFrame({
+        'year': dates[counted].dt.year,
+        'month': dates[counted].dt.month,
+        'identifier': identifiers[counted],
+        'cents': cents[counted].astype('int64'),
+    })
+
+def summary_row_changes(transactions_df, label, old_identifier, new_identifier):
+    # summary_changes for one relabeled row, without building frames
+    transaction_date = transactions_df.at[label, 'Transaction Date']
+    cents = transactions_df.at[label, 'Amount']
+    if pd.isna(transaction_date) or pd.isna(cents):
+        return []
+    if 'Transfer Link' in transactions_df.columns:
+        link = transactions_df.at[label, 'Transfer Link']
+        if isinstance(link, str) and link and cents > 0:
+            return []
+    changes = []
+    if old_identifier:
+        changes.append((transaction_date.year, transaction_date.month, old_identifier, int(cents), -1))
+    if new_identifier:
+        changes.append((transaction_date.year, transaction_date.month, new_identifier, int(cents), 1))
+    return changes
+
+def summary_changes(transactions_df, old_identifiers):
     """
+    Returns the (year, month, identifier, cents, n) changes that move the
+    summary from the rows of old_identifiers (a Series indexed by frame
+    labels) having those identifiers to having their current ones.
+    """
+    rows = transactions_df.loc[old_identifiers.index]
+    before = summary_contributions(rows.assign(**{'Custom Identifier': old_identifiers}))
+    after = summary_contributions(rows)
+    changes = pd.concat([before.assign(n=-1), after.assign(n=1)], ignore_index=True)
+    changes = changes.groupby(['year', 'month', 'identifier', 'cents'], as_index=False)['n'].sum()
+    changes = changes[changes['n'] != 0]
+    return list(zip(*(changes[column].tolist() for column in ['year', 'month', 'identifier', 'cents', 'n'])))
+
+class BudgetSummary:
+    """
+    Materialized spend per (year, month, Custom Identifier) in SQLite: total,
+    count, min and max of the amounts, in cents. Alongside, each group keeps
+    the multiset of its amounts (amount -> row count), so a relabeled row
+    only touches the two groups it leaves and joins, and min/max come from
+    an index lookup rather than a rescan. Like the processed store, it may be
+    used from the BackgroundWriter thread.
+    """
+    def __init__(self, db_path=None):
+        self.db_path = db_path or summary_file
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS amounts ("
+                "year INTEGER NOT NULL, month INTEGER NOT NULL, identifier TEXT NOT NULL, cents INTEGER NOT NULL, "
+                "n INTEGER NOT NULL, PRIMARY KEY (year, month, identifier, cents)) WITHOUT ROWID"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS monthly ("
+                "year INTEGER NOT NULL, month INTEGER NOT NULL, identifier TEXT NOT NULL, "
+                "total_cents INTEGER NOT NULL, count INTEGER NOT NULL, min_cents INTEGER NOT NULL, max_cents INTEGER NOT NULL, "
+                "PRIMARY KEY (year, month, identifier)) WITHOUT ROWID"
+            )
+            # Partitions whose contents the summary reflects, by size and mtime
+            self.conn.execute("CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER)")
+
+    def _refresh_groups(self, groups):
+        for group in groups:
+            self.conn.execute("DELETE FROM monthly WHERE year = ? AND month = ? AND identifier = ?", group)
+            self.conn.execute(
+                "INSERT INTO monthly SELECT year, month, identifier, SUM(cents * n), SUM(n), MIN(cents), MAX(cents) "
+                "FROM amounts WHERE year = ? AND month = ? AND identifier = ? GROUP BY year, month, identifier",
+                group
+            )
+
+    def apply_changes(self, changes):
+        """
+        Applies (year, month, identifier, cents, n) changes, n being the
+        number of rows added (or removed, when negative).
+        """
+        combined = {}
+        for year, month, identifier, cents, n in changes:
+            key = (int(year), int(month), identifier, int(cents))
+            combined[key] = combined.get(key, 0) + n
+        combined = {key: n for key, n in combined.items() if n}
+        if not combined:
+            return
+        with self.lock, metrics.stage('summary_update'), self.conn:
+            self.conn.executemany(
+                "INSERT INTO amounts (year, month, identifier, cents, n) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (year, month, identifier, cents) DO UPDATE SET n = n + excluded.n",
+                (key + (n,) for key, n in combined.items())
+            )
+            self.conn.executemany(
+                "DELETE FROM amounts WHERE year = ? AND month = ? AND identifier = ? AND cents = ? AND n <= 0",
+                combined.keys()
+            )
+            self._refresh_groups({key[:3] for key in combined})
+
+    def rebuild_months(self, transactions_df):
+        """
+        Replaces the summary of every month present in the frame, which must
+        hold those months completely (a partition, or the loaded session).
+        """
+        dates = transactions_df['Transaction Date'].dropna()
+        months = sorted(set(zip(dates.dt.year.tolist(), dates.dt.month.tolist())))
+        counts = summary_contributions(transactions_df).groupby(['year', 'month', 'identifier', 'cents']).size()
+        with self.lock, metrics.stage('summary_rebuild'), self.conn:
+            for table in ('amounts', 'monthly'):
+                self.conn.executemany(f"DELETE FROM {table} WHERE year = ? AND month = ?", months)
+            self.conn.executemany(
+                "INSERT INTO amounts (year, month, identifier, cents, n) VALUES (?, ?, ?, ?, ?)",
+                ((int(year), int(month), identifier, int(cents), int(n)) for (year, month, identifier, cents), n in counts.items())
+            )
+            self.conn.executemany(
+                "INSERT INTO monthly SELECT year, month, identifier, SUM(cents * n), SUM(n), MIN(cents), MAX(cents) "
+                "FROM amounts WHERE year = ? AND month = ? GROUP BY year, month, identifier",
+                months
+            )
+
+    def record_source(self, path):
+        stat = os.stat(path)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sources (path, size, mtime_ns) VALUES (?, ?, ?)",
+                (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+            )
+
+    def sync_history(self, history=None, exclude_path=None):
+        """
+        Rebuilds the months whose history partition changed since the
+        summary last saw it, skipping the partition at exclude_path.
+        Returns the number of partitions read.
+        """
+        history = history or TransactionHistory()
+        with self.lock:
+            known = {path: (size, mtime_ns) for path, size, mtime_ns in self.conn.execute("SELECT path, size, mtime_ns FROM sources")}
+        synced = 0
+        for path in sorted(glob.glob(os.path.join(history.directory, "*", "*.csv"))):
+            if exclude_path and os.path.abspath(path) == os.path.abspath(exclude_path):
+                continue
+            stat = os.stat(path)
+            if known.get(os.path.abspath(path)) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            transactions = read_transactions(path)
+            self.rebuild_months(transactions[transactions['Description'] != '#NAME?'])
+            self.record_source(path)
+            synced += 1
+        return synced
+
+    def monthly(self):
+        with self.lock:
+            df = pd.read_sql_query("SELECT * FROM monthly ORDER BY year, month, identifier", self.conn)
+        for column in ('total', 'min', 'max'):
+            df[column] = df.pop(f"{column}_cents") / 100
+        return df
+
+    def report(self, kind='trailing', months=SUMMARY_TRAILING_MONTHS):
+        """
+        Returns a report frame in dollars:
+        'trailing' - total, count, min, max and monthly average per identifier over the last `months` months with data,
+                     or every month since the first if there are fewer
+        'monthly'  - identifier x YYYY-MM totals
+        'yearly'   - identifier x year totals
+        """
+        df = self.monthly()
+        if kind == 'monthly':
+            df['period'] = df['year'].astype(str) + '-' + df['month'].astype(str).str.zfill(2)
+            return df.pivot_table(index='identifier', columns='period', values='total', aggfunc='sum', fill_value=0)
+        if kind == 'yearly':
+            return df.pivot_table(index='identifier', columns='year', values='total', aggfunc='sum', fill_value=0)
+        if kind != 'trailing':
+            raise ValueError(f"Unknown report: {kind}")
+        if df.empty:
+            return pd.DataFrame(columns=['total', 'count', 'min', 'max', 'monthly average'])
+        period = df['year'] * 12 + df['month'] - 1
+        first = max(period.max() - months + 1, period.min())
+        recent = df[period >= first]
+        report = recent.groupby('identifier').agg(total=('total', 'sum'), count=('count', 'sum'), min=('min', 'min'), max=('max', 'max'))
+        report['monthly average'] = report['total'] / (period.max() - first + 1)
+        return report.sort_values('total')
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def export_report(report_df, path):
+    """
+    Writes a report to .xlsx (with openpyxl) or, for any other extension, CSV.
+    """
+    if path.lower().endswith('.xlsx'):
+        report_df.to_excel(path, sheet_name='Summary', engine='openpyxl')
+    else:
+        report_df.to_csv(path)
+
+def filter_transactions_by_date(month, year, source_paths=None):
+    """
+    Filter transactions in the selected CSV file(s) to keep only those in the specified month and year.
+    The exports (default: the global csv_file) are ingested into the
+    partitioned TransactionHistory (once per export) and the month's
+    partition becomes the global csv_file. The exports themselves are never modified.
+    """
+    global csv_file
     try:
-        if not os.path.exists(csv_file):
+        source_paths = source_paths or [csv_file]
+        if not all(os.path.exists(path) for path in source_paths):
             messagebox.showerror("Error", "Please select a CSV file first.")
             return 0, 0
-            
-        # Read the CSV file
-        df = pd.read_csv(csv_file)
-        
-        # Convert Transaction Date to datetime
-        df['Transaction Date'] = pd.to_datetime(df['Transaction Date'], errors='coerce')
-        
-        # Filter by month and year
-        filtered_df = df[
-            (df['Transaction Date'].dt.month == int(month)) & 
-            (df['Transaction Date'].dt.year == int(year))
-        ]
-        
-        # Save filtered transactions back to CSV
-        filtered_df.to_csv(csv_file, index=False)
-        
-        return len(filtered_df), len(df)
+
+        history = TransactionHistory()
+        with metrics.stage('filter'):
+            total_count = history.ingest_many(source_paths)
+        partition_file = history.partition_path(year, month)
+        if not os.path.exists(partition_file):
+            return 0, total_count
+
+        filtered_count = len(pd.read_csv(partition_file, usecols=['Transaction Date']))
+        csv_file = partition_file
+        return filtered_count, total_count
         
     except Exception as e:
         messagebox.showerror("Error", f"Failed to filter transactions: {e}")
         return 0, 0
 
 class BudgetTrackerGUI:
-    def __init__(self, master):
+    def __init__(self, master, deferred_startup=True):
         self.master = master
         master.title("Personal Budget Tracker")
 
         # Load description to identifier mappings
         self.load_mappings()
 
+        # Load transactions; only what the first screen needs happens here
+        self.transactions, self.removed_rows = load_session_transactions(csv_file)
+        # Disk writes go through the background writer; it reports progress in the status label
+        self.writer = BackgroundWriter(master, on_status=self.update_write_status)
+        self.processed_transactions = None
+        self.summary = None
+        self.grid = None
+        self.search = None
+        self.search_window = None
+        self.transaction_index = {}
+        # Edits since the last compaction are journaled instead of rewriting the file
+        self.journal = ChangeJournal(csv_file)
+        self.journal_bytes = self.journal.size()
+        self.undo_stack = []
+        # Identifier suggestions learned from labeled descriptions, and the
+        # identifiers set while the full index is being built (None once built)
+        self.suggester = IdentifierSuggester()
+        self.suggester_updates = None
+
+        self.current_index = 0
+        self.hide_processed = tk.BooleanVar(value=False)
+        # Running label counts and the rows being navigated (positions in
+        # self.transactions, whose index is a RangeIndex)
+        self.refresh_label_counts()
+        self.view_positions = self.all_positions
+        # Identifier last put in the combobox by display_transaction
+        self.shown_identifier = ''
+
+        # Create UI elements
+        self.create_widgets()
+        self.update_transaction_counter()
+        self.display_transaction()
+        # Closing the window waits for pending writes like Finished does
+        master.protocol("WM_DELETE_WINDOW", self.close)
+
+        # The rest of the load runs in stages from the event loop so the first
+        # transaction is on screen immediately. Handlers that need it finished
+        # call complete_startup() first.
+        self._startup_stages = [
+            self._record_removed_rows,
+            self._apply_startup_mappings,
+            self._build_transaction_index,
+            self._replay_journal,
+            self._record_labeled_transactions,
+            self._sync_summary,
+            self._start_suggester_build,
+        ]
+        if deferred_startup:
+            self.master.after_idle(self._run_next_startup_stage)
+        else:
+            self.complete_startup()
+
+    def _run_next_startup_stage(self):
+        if self._startup_stages:
+            self._run_startup_stage(self._startup_stages.pop(0))
+        if self._startup_stages:
+            self.master.after(1, self._run_next_startup_stage)
+
+    def complete_startup(self):
+        """
+        Runs any startup stages that have not happened yet.
+        """
+        while self._startup_stages:
+            self._run_startup_stage(self._startup_stages.pop(0))
+
+    def _run_startup_stage(self, stage):
+        with metrics.stage('startup.' + stage.__name__.lstrip('_')):
+            stage()
+
+    def _record_removed_rows(self):
         # Load processed transactions
         self.load_processed_transactions()
+        # Save removed rows to the processed transactions store
+        if not self.removed_rows.empty:
+            rows = ProcessedTransactionStore.rows_from_frame(self.removed_rows)
+            self.writer.submit(
+                functools.partial(self.processed_transactions.add_many, rows),
+                "save removed transactions to processed file"
+            )
+        self.removed_rows = None
+
+    def _apply_startup_mappings(self):
+        # Distinct descriptions and their trigram index, used for incremental mapping
+        self.description_index = DescriptionIndex(self.transactions['Normalized Description'])
+        # Apply mappings to assign identifiers automatically
+        self.apply_mappings()
+        self.update_transaction_counter()
+        self.refresh_transaction()
+
+    def _record_labeled_transactions(self):
+        # Add all processed transactions (with Custom Identifier) to the processed store in one batch
+        labeled = self.transactions[self.transactions['Custom Identifier'] != '']
+        rows = ProcessedTransactionStore.rows_from_frame(labeled)
+        self.writer.submit(
+            functools.partial(self.processed_transactions.add_many, rows),
+            "save processed transactions during initialization"
+        )
+
+    def _build_transaction_index(self):
+        # Index from Transaction Key to row labels in self.transactions
+        self.transaction_index = build_transaction_index(self.transactions)
 
-        # Load transactions
-        self.transactions = pd.read_csv(csv_file)
-        # Remove rows with Description "#NAME?"
-        removed_rows = self.transactions[self.transactions['Description'] == '#NAME?']
-        self.transactions = self.transactions[self.transactions['Description'] != '#NAME?']
-        # Save removed rows to processed_transactions.csv
-        if not removed_rows.empty:
+    def _sync_summary(self):
+        # The loaded month is summarized from the session, after mappings and journal replay
+        self.summary = BudgetSummary()
+        self.writer.submit(
+            functools.partial(self.summary.rebuild_months, self.transactions.copy()),
+            "update budget summary"
+        )
+
+    def update_summary(self, changes):
+        if changes and self.summary is not None:
+            self.writer.submit(functools.partial(self.summary.apply_changes, changes), "update budget summary")
+
+    def _start_suggester_build(self):
+        # The suggestion index is built on a worker thread; identifiers set in
+        # the meantime are replayed onto it before it replaces self.suggester
+        labeled = self.transactions.loc[self.transactions['Custom Identifier'] != '',
+                                        ['Normalized Description', 'Custom Identifier']]
+        self.suggester_updates = []
+        result = queue.Queue()
+
+        def build():
             try:
-                import csv
-                file_exists = os.path.exists("processed_transactions.csv")
-                with open("processed_transactions.csv", mode='a', newline='', encoding='utf-8') as f:
-                    writer = csv.DictWriter(f, fieldnames=['Transaction Date', 'Description', 'Amount'])
-                    if not file_exists:
-                        writer.writeheader()
-                    for _, row in removed_rows.iterrows():
-                        key = (
-                            str(row.get('Transaction Date', '')).strip(),
-                            str(row.get('Description', '')).strip(),
-                            str(row.get('Amount', '')).strip()
-                        )
-                        # Avoid duplicates by checking if key already in processed_transactions
-                        if key not in self.processed_transactions:
-                            writer.writerow({
-                                'Transaction Date': row.get('Transaction Date', ''),
-                                'Description': row.get('Description', ''),
-                                'Amount': row.get('Amount', '')
-                            })
-                            self.processed_transactions.add(key)
+                result.put(build_suggester(labeled, exclude_path=csv_file))
             except Exception as e:
-                messagebox.showerror("Error", f"Failed to save removed transactions to processed file: {e}")
-        # Keep only relevant columns
-        relevant_columns = ['Transaction Date', 'Amount', 'Credit Debit Indicator', 'type', 'Description', 'Category']
-        # Add 'Custom Identifier' if present or create empty
-        if 'Custom Identifier' in self.transactions.columns:
-            relevant_columns.append('Custom Identifier')
-        self.transactions = self.transactions[relevant_columns]
-
-        # Add Custom Identifier column if not present
-        if 'Custom Identifier' not in self.transactions.columns:
-            self.transactions['Custom Identifier'] = ''
-        
-        # Replace NaN or 'nan' strings with empty string in Custom Identifier column
-        self.transactions['Custom Identifier'] = self.transactions['Custom Identifier'].replace('nan', '').fillna('').astype(str)
+                logger.warning("Could not build identifier suggestions: %s", e)
+                result.put(None)
 
-        # Apply mappings to assign identifiers automatically
-        self.apply_mappings()
-        # Save updated transactions with assigned identifiers to CSV on first load
-        self.transactions.to_csv(csv_file, index=False)
+        threading.Thread(target=build, name="budget-suggester", daemon=True).start()
+        self.master.after(SUGGESTER_POLL_MS, functools.partial(self._finish_suggester_build, result))
 
-        # Add all processed transactions (with Custom Identifier) to processed_transactions.csv
+    def _finish_suggester_build(self, result):
         try:
-            import csv
-            file_exists = os.path.exists("processed_transactions.csv")
-            with open("processed_transactions.csv", mode='a', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=['Transaction Date', 'Description', 'Amount'])
-                if not file_exists:
-                    writer.writeheader()
-                for _, row in self.transactions.iterrows():
-                    txn_key = (
-                        str(row.get('Transaction Date', '')).strip(),
-                        str(row.get('Description', '')).strip(),
-                        str(row.get('Amount', '')).strip()
-                    )
-                    if row.get('Custom Identifier', '') and txn_key not in self.processed_transactions:
-                        writer.writerow({
-                            'Transaction Date': row.get('Transaction Date', ''),
-                            'Description': row.get('Description', ''),
-                            'Amount': row.get('Amount', '')
-                        })
-                        self.processed_transactions.add(txn_key)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save processed transactions during initialization: {e}")
+            suggester = result.get_nowait()
+        except queue.Empty:
+            self.master.after(SUGGESTER_POLL_MS, functools.partial(self._finish_suggester_build, result))
+            return
+        if suggester is not None:
+            for descriptions, identifiers in self.suggester_updates:
+                suggester.add_many(descriptions, identifiers)
+            self.suggester = suggester
+        self.suggester_updates = None
+        self.refresh_transaction()
 
-        self.current_index = 0
-        self.hide_processed = tk.BooleanVar(value=False)
-        self.filtered_transactions = self.transactions.copy()
+    def learn_identifiers(self, descriptions, identifiers):
+        descriptions, identifiers = list(descriptions), list(identifiers)
+        self.suggester.add_many(descriptions, identifiers)
+        if self.suggester_updates is not None:
+            self.suggester_updates.append((descriptions, identifiers))
 
-        # Create UI elements
-        self.create_widgets()
-        self.update_transaction_counter()
-        self.display_transaction()
+    def _replay_journal(self):
+        # Restore edits from a session that ended before they were compacted
+        records = self.journal.read()
+        if records:
+            replay_journal(self.transactions, records, self.transaction_index, self.mappings, self.description_index)
+            logger.info("Replayed %d journaled changes from '%s'", len(records), self.journal.path)
+            self.refresh_label_counts()
+            self.update_transaction_counter()
+            self.refresh_transaction()
 
     def load_mappings(self):
         if os.path.exists(mapping_file):
@@ -277,16 +2247,17 @@ class BudgetTrackerGUI:
             self.mappings = {}
 
     def save_mappings(self):
-        try:
-            with open(mapping_file, 'w') as f:
-                json.dump(self.mappings, f, indent=4)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save mappings: {e}")
+        # Write a snapshot so later edits on the Tk thread cannot race the writer
+        self.writer.submit(
+            functools.partial(save_mapping_file, dict(self.mappings), mapping_file),
+            "save mappings", key='mappings'
+        )
 
     def add_mapping(self):
+        self.complete_startup()
         # Use the current transaction's Description field as the key
-        if 0 <= self.current_index < len(self.filtered_transactions):
-            desc = str(self.filtered_transactions.iloc[self.current_index].get('Description', '')).strip().lower()
+        if 0 <= self.current_index < len(self.view_positions):
+            desc = self.current_row()['Normalized Description']
             identifier = self.identifier_var.get().strip()
             if not desc or not identifier:
                 messagebox.showwarning("Warning", "Current transaction description or identifier is empty.")
@@ -294,25 +2265,29 @@ class BudgetTrackerGUI:
             self.mappings[desc] = identifier
             self.save_mappings()
             messagebox.showinfo("Info", f"Mapping added: '{desc}' -> '{identifier}'")
-            # Re-apply mappings to transactions
-            self.apply_mappings()
+            # Apply the new mapping to the rows containing it, respecting earlier keys
+            before = self.transactions['Custom Identifier'].to_numpy(copy=True)
+            positions = apply_mapping_key(self.transactions, self.mappings, desc, self.description_index)
+            self.mark_labeled(positions)
+            self.update_summary(summary_changes(
+                self.transactions, pd.Series(before[positions], index=self.transactions.index[positions])
+            ))
+            self.learn_identifiers([desc], [identifier])
+            logger.info("Mapping '%s' applied to %d transactions", desc, len(positions))
+            self.append_journal([{'op': 'mapping', 'mapping_key': desc, 'ts': datetime.now().isoformat()}])
             # Update filtered transactions after applying mappings
             self.toggle_hide_processed()
             self.display_transaction()
 
     def apply_mappings(self):
-        for idx, row in self.transactions.iterrows():
-            description = str(row.get('Description', '')).lower()
-            for key, val in self.mappings.items():
-                if key in description:
-                    print(f"Mapping applied: '{key}' -> '{val}' for description '{description}'")  # Debug log
-                    self.transactions.at[idx, 'Custom Identifier'] = val
-                    break
+        labeled = apply_mappings(self.transactions, self.mappings, self.description_index)
+        self.refresh_label_counts()
+        logger.info("Mappings applied to %d transactions", labeled)
 
     def create_widgets(self):
         # Labels for transaction fields
         self.labels = {}
-        fields = ['Transaction Date', 'Amount', 'Credit Debit Indicator', 'type', 'Description', 'Category']
+        fields = ['Transaction Date', 'Amount', 'Credit Debit Indicator', 'type', 'Description', 'Category', 'Account']
         row = 0
         for field in fields:
             lbl = ttk.Label(self.master, text=field + ":")
@@ -326,10 +2301,16 @@ class BudgetTrackerGUI:
         ttk.Label(self.master, text="Custom Identifier:").grid(row=row, column=0, sticky='e', padx=5, pady=5)
         self.identifier_var = tk.StringVar()
         self.identifier_combo = ttk.Combobox(self.master, textvariable=self.identifier_var)
-        self.identifier_combo['values'] = sorted(['Ignore', 'Rent', 'Phone', 'Philo', 'Spotify', 'Peacock', 'Youtube', 'Canva', 'Microsoft Office', 'Xbox', 'Adobe', 'Fuel', 'Car wash', 'USAA', 'Groceries', 'Vitamins', 'Coffee', 'LMNT', 'Toothpaste', 'Amazon', 'Eating out', 'Other', 'Burn Bootcamp', 'Planet Fitness', 'National Academy', 'Income', 'Savings'])
+        self.identifier_values = sorted(['Ignore', 'Rent', 'Phone', 'Philo', 'Spotify', 'Peacock', 'Youtube', 'Canva', 'Microsoft Office', 'Xbox', 'Adobe', 'Fuel', 'Car wash', 'USAA', 'Groceries', 'Vitamins', 'Coffee', 'LMNT', 'Toothpaste', 'Amazon', 'Eating out', 'Other', 'Burn Bootcamp', 'Planet Fitness', 'National Academy', 'Income', 'Savings'])
+        self.identifier_combo['values'] = self.identifier_values
         self.identifier_combo.grid(row=row, column=1, sticky='w', padx=5, pady=5)
         row += 1
 
+        # Suggested identifiers for unlabeled transactions
+        self.suggestion_label = ttk.Label(self.master, text="")
+        self.suggestion_label.grid(row=row, column=0, columnspan=2, pady=2)
+        row += 1
+
         # Transaction counter label
         self.transaction_counter_label = ttk.Label(self.master, text="")
         self.transaction_counter_label.grid(row=row, column=0, columnspan=2, pady=5)
@@ -352,6 +2333,10 @@ class BudgetTrackerGUI:
         self.next_button = ttk.Button(self.master, text="Next", command=self.next_transaction)
         self.next_button.grid(row=row, column=1, sticky='w', padx=5, pady=10)
 
+        # Undo the last identifier change
+        self.undo_button = ttk.Button(self.master, text="Undo", command=self.undo_last_change)
+        self.undo_button.grid(row=row+1, column=0, columnspan=2, pady=5)
+
         # Clear processed transactions button
         self.clear_processed_button = ttk.Button(self.master, text="Clear Processed Transactions", command=self.clear_processed_transactions)
         self.clear_processed_button.grid(row=row+2, column=0, columnspan=2, pady=5)
@@ -368,23 +2353,91 @@ class BudgetTrackerGUI:
         self.finished_button = ttk.Button(self.master, text="Finished", command=self.save_to_csv)
         self.finished_button.grid(row=row+5, column=0, columnspan=2, pady=10)
 
-    def clear_processed_transactions(self):
+        # Spend per identifier and month
+        self.summary_button = ttk.Button(self.master, text="Budget Summary", command=self.show_summary)
+        self.summary_button.grid(row=row+6, column=0, columnspan=2, pady=5)
+
+        # Scrollable list of transactions with bulk labeling
+        self.grid_button = ttk.Button(self.master, text="Transaction Grid", command=self.show_grid)
+        self.grid_button.grid(row=row+7, column=0, columnspan=2, pady=5)
+
+        # Find transactions by description, amount and date
+        self.search_button = ttk.Button(self.master, text="Search", command=self.show_search)
+        self.search_button.grid(row=row+8, column=0, columnspan=2, pady=5)
+
+        # Background write progress
+        self.write_status_label = ttk.Label(self.master, text="All changes saved")
+        self.write_status_label.grid(row=row+9, column=0, columnspan=2, pady=5)
+
+    def show_summary(self):
+        self.complete_startup()
+        # Queued summary updates land before the report is read
+        self.writer.flush()
+        try:
+            self.summary.sync_history(exclude_path=csv_file)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to update budget summary: {e}")
+            return
+        window = tk.Toplevel(self.master)
+        window.title("Budget Summary")
+        controls = ttk.Frame(window)
+        controls.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Label(controls, text="Report:").pack(side=tk.LEFT, padx=5)
+        kind_var = tk.StringVar(value=SUMMARY_REPORTS[0])
+        kind_combo = ttk.Combobox(controls, textvariable=kind_var, values=list(SUMMARY_REPORTS), state="readonly")
+        kind_combo.pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Export...", command=lambda: self.export_summary(kind_var.get())).pack(side=tk.LEFT, padx=5)
+        tree = ttk.Treeview(window, show='headings', height=20)
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        def refresh(*_):
+            report = self.summary.report(kind_var.get())
+            columns = ['identifier'] + [str(column) for column in report.columns]
+            tree.delete(*tree.get_children())
+            tree['columns'] = columns
+            for column in columns:
+                tree.heading(column, text=column)
+                tree.column(column, width=100, anchor='w' if column == 'identifier' else 'e')
+            for identifier, values in report.iterrows():
+                tree.insert('', tk.END, values=[identifier] + [f"{value:,.2f}" if isinstance(value, float) else value for value in values])
+
+        kind_combo.bind('<<ComboboxSelected>>', refresh)
+        refresh()
+
+    def export_summary(self, kind):
+        path = filedialog.asksaveasfilename(
+            title="Export Budget Summary",
+            defaultextension=".xlsx",
+            filetypes=[("Excel workbook", "*.xlsx"), ("CSV files", "*.csv")]
+        )
+        if not path:
+            return
         try:
-            if os.path.exists("processed_transactions.csv"):
-                os.remove("processed_transactions.csv")
-            self.processed_transactions.clear()
-            messagebox.showinfo("Success", "Processed transactions cleared.")
+            export_report(self.summary.report(kind), path)
+            messagebox.showinfo("Success", f"Budget summary exported to '{path}'.")
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to clear processed transactions: {e}")
+            messagebox.showerror("Error", f"Failed to export budget summary: {e}")
+
+    def clear_processed_transactions(self):
+        self.complete_startup()
+        self.writer.submit(
+            self.processed_transactions.clear, "clear processed transactions",
+            on_done=lambda _: messagebox.showinfo("Success", "Processed transactions cleared.")
+        )
 
     def clear_all_custom_identifiers(self):
+        self.complete_startup()
         try:
             # Clear all custom identifiers in the transactions DataFrame
+            old_identifiers = self.transactions['Custom Identifier'].copy()
+            self.undo_stack.append(('clear', old_identifiers))
             self.transactions['Custom Identifier'] = ''
-            # Save the updated DataFrame back to CSV
-            self.transactions.to_csv(csv_file, index=False)
-            # Refresh the filtered transactions to only those without custom identifiers
-            self.transactions = self.transactions[self.transactions['Custom Identifier'].isnull() | (self.transactions['Custom Identifier'] == '')].reset_index(drop=True)
+            self.update_summary(summary_changes(self.transactions, old_identifiers[old_identifiers != '']))
+            # Journal the clear instead of rewriting the CSV
+            self.append_journal([{'op': 'clear', 'ts': datetime.now().isoformat()}])
+            # Every row is now unlabeled, so both views show all transactions
+            self.refresh_label_counts()
+            self.view_positions = self.all_positions
             self.current_index = 0
             self.update_transaction_counter()
             self.display_transaction()
@@ -393,27 +2446,35 @@ class BudgetTrackerGUI:
             messagebox.showerror("Error", f"Failed to clear custom identifiers: {e}")
 
     def backup_processed_transactions(self):
-        import shutil
-        import datetime
-        try:
-            if os.path.exists("processed_transactions.csv"):
-                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                backup_filename = f"processed_transactions_backup_{timestamp}.csv"
-                shutil.copy("processed_transactions.csv", backup_filename)
-                messagebox.showinfo("Success", f"Backup created: {backup_filename}")
+        self.complete_startup()
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_filename = f"processed_transactions_backup_{timestamp}.db"
+
+        def backup():
+            # Runs after any queued processed-store writes
+            if not len(self.processed_transactions):
+                return None
+            self.processed_transactions.backup(backup_filename)
+            return backup_filename
+
+        def report(result):
+            if result:
+                messagebox.showinfo("Success", f"Backup created: {result}")
             else:
-                messagebox.showwarning("Warning", "No processed transactions file to backup.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to backup processed transactions: {e}")
+                messagebox.showwarning("Warning", "No processed transactions to backup.")
+
+        self.writer.submit(backup, "backup processed transactions", on_done=report)
 
     def display_transaction(self):
-        if 0 <= self.current_index < len(self.filtered_transactions):
-            row = self.filtered_transactions.iloc[self.current_index]
+        if 0 <= self.current_index < len(self.view_positions):
+            row = self.current_row()
             for field, label in self.labels.items():
-                label.config(text=str(row.get(field, '')))
+                label.config(text=display_value(field, row.get(field, '')))
             # Set combobox to current custom identifier or empty
             current_id = row.get('Custom Identifier', '')
             self.identifier_var.set(current_id)
+            self.shown_identifier = current_id
+            self.show_suggestions(row, current_id)
 
             # Enable editing controls
             self.identifier_combo.config(state='normal')
@@ -421,39 +2482,210 @@ class BudgetTrackerGUI:
         else:
             messagebox.showinfo("Info", "No more transactions.")
 
+    def refresh_transaction(self):
+        """
+        Re-reads the shown row after a startup stage changed the frame. The
+        field labels and suggestions are updated, but the combobox only if
+        the user has not edited it since the row was shown, and nothing is
+        reported when there is no row to show.
+        """
+        if not 0 <= self.current_index < len(self.view_positions):
+            return
+        row = self.current_row()
+        for field, label in self.labels.items():
+            label.config(text=display_value(field, row.get(field, '')))
+        current_id = row.get('Custom Identifier', '')
+        if self.identifier_var.get() == self.shown_identifier:
+            self.identifier_var.set(current_id)
+            self.shown_identifier = current_id
+        self.show_suggestions(row, current_id)
+
+    def show_suggestions(self, row, current_id):
+        """
+        Lists the best identifiers for an unlabeled row and moves them to
+        the top of the combobox.
+        """
+        suggestions = [] if current_id else self.suggester.suggest(row.get('Description', ''), k=SUGGESTION_COUNT)
+        suggested = [identifier for identifier, _ in suggestions]
+        self.identifier_combo['values'] = suggested + [value for value in self.identifier_values if value not in suggested]
+        if suggestions:
+            self.suggestion_label.config(text="Suggestions: " + ", ".join(f"{identifier} ({score:.0%})" for identifier, score in suggestions))
+        else:
+            self.suggestion_label.config(text="")
+
     def save_current_identifier(self):
-        if 0 <= self.current_index < len(self.filtered_transactions):
-            row = self.filtered_transactions.iloc[self.current_index]
-            txn_key = (
-                str(row.get('Transaction Date', '')).strip(),
-                str(row.get('Description', '')).strip(),
-                str(row.get('Amount', '')).strip()
-            )
-            # Always update the Custom Identifier
-            # Need to update the original transactions DataFrame as well
-            # Normalize description strings for matching and include Amount
-            original_index = self.transactions.index[
-                (self.transactions['Transaction Date'].astype(str).str.strip() == str(row['Transaction Date']).strip()) &
-                (self.transactions['Description'].astype(str).str.strip().str.lower() == str(row['Description']).strip().lower()) &
-                (self.transactions['Amount'].astype(str).str.strip() == str(row['Amount']).strip())
-            ].tolist()
-            if original_index:
-                selected_identifier = self.identifier_var.get()
-                print(f"Saving Custom Identifier '{selected_identifier}' for transaction with description '{row['Description']}' and amount '{row['Amount']}'")  # Debug log
-                # If "Ignore" is selected, save empty string as Custom Identifier
-                if selected_identifier == "Ignore":
-                    self.transactions.at[original_index[0], 'Custom Identifier'] = ''
-                else:
-                    self.transactions.at[original_index[0], 'Custom Identifier'] = selected_identifier
-            else:
-                print(f"No matching transaction found for description '{row['Description']}' and amount '{row['Amount']}'")  # Debug log
-            # Mark transaction as processed if not already
-            if txn_key not in self.processed_transactions:
-                self.save_processed_transaction(*txn_key)
+        self.complete_startup()
+        if 0 <= self.current_index < len(self.view_positions):
+            row = self.current_row()
+            processed_row = ProcessedTransactionStore.row_for(row)
+            # Always update the Custom Identifier of the row in self.transactions
+            selected_identifier = self.identifier_var.get()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Saving Custom Identifier '%s' for transaction with description '%s' and amount '%s'",
+                             selected_identifier, row['Description'], format_amount(row['Amount']))
+            # If "Ignore" is selected, save empty string as Custom Identifier
+            if selected_identifier == "Ignore":
+                selected_identifier = ''
+            self.set_identifier(row.name, selected_identifier)
+            # Mark transaction as processed; the store ignores keys it already has
+            self.save_processed_transaction(processed_row)
+
+    def set_identifier(self, original_index, identifier, record_undo=True):
+        """
+        Sets the Custom Identifier of one row and journals the change.
+        """
+        old_identifier = self.transactions.at[original_index, 'Custom Identifier']
+        if old_identifier == identifier:
+            return
+        self.transactions.at[original_index, 'Custom Identifier'] = identifier
+        metrics.count('identifiers_set')
+        self.update_label_count(original_index, identifier != '')
+        self.update_summary(summary_row_changes(self.transactions, original_index, old_identifier, identifier))
+        self.learn_identifiers([self.transactions.at[original_index, 'Normalized Description']], [identifier])
+        key = self.journal_key(original_index)
+        self.append_journal([{'key': key, 'old': old_identifier, 'new': identifier, 'ts': datetime.now().isoformat()}])
+        if record_undo:
+            self.undo_stack.append(('set', original_index, old_identifier))
+
+    def set_identifiers(self, labels, identifiers, record_undo=True):
+        """
+        Sets the Custom Identifier of many rows in one vectorized update, with
+        a single journal append, summary update and undo entry. identifiers
+        is one value for all rows or one per label. Returns the number of
+        rows that changed.
+        """
+        old = self.transactions.loc[labels, 'Custom Identifier']
+        new = pd.Series(identifiers, index=old.index, dtype=object)
+        changed = (old != new).to_numpy()
+        old, new = old[changed], new[changed]
+        if old.empty:
+            return 0
+        self.transactions.loc[old.index, 'Custom Identifier'] = new.to_numpy()
+        metrics.count('identifiers_set', len(old))
+        self.labeled_mask[old.index.to_numpy()] = (new != '').to_numpy()
+        self.labeled_count = int(self.labeled_mask.sum())
+        self.learn_identifiers(self.transactions.loc[old.index, 'Normalized Description'], new)
+        self.update_summary(summary_changes(self.transactions, old))
+        now = datetime.now().isoformat()
+        self.append_journal([
+            {'key': key, 'old': old_identifier, 'new': identifier, 'ts': now}
+            for key, old_identifier, identifier in zip(self.journal_keys(old.index), old, new)
+        ])
+        if record_undo:
+            self.undo_stack.append(('bulk', old))
+        return len(old)
+
+    def label_rows(self, positions, identifier):
+        """
+        Gives the rows at the given positions one identifier (bulk labeling
+        from the grid) and marks them all processed in one batched write.
+        """
+        self.complete_startup()
+        # If "Ignore" is selected, save empty string as Custom Identifier
+        if identifier == "Ignore":
+            identifier = ''
+        labels = self.transactions.index[np.sort(np.asarray(list(positions), dtype=int))]
+        changed = self.set_identifiers(labels, identifier)
+        rows = ProcessedTransactionStore.rows_from_frame(self.transactions.loc[labels])
+        self.writer.submit(
+            functools.partial(self.processed_transactions.add_many, rows),
+            "save processed transactions"
+        )
+        self.refresh_view()
+        return changed
+
+    def journal_keys(self, labels):
+        # journal_key for many rows
+        keys = self.transactions.loc[labels, 'Transaction Key'].tolist()
+        return [[key, self.transaction_index.get(key, [label]).index(label)] for key, label in zip(keys, labels)]
+
+    def journal_key(self, original_index):
+        key = int(self.transactions.at[original_index, 'Transaction Key'])
+        return [key, self.transaction_index.get(key, [original_index]).index(original_index)]
+
+    def append_journal(self, records):
+        """
+        Queues journal records and compacts once the journal passes JOURNAL_COMPACT_BYTES.
+        """
+        self.journal_bytes += sum(len(json.dumps(record)) + 1 for record in records)
+        metrics.count('journal_records', len(records))
+        self.writer.submit(functools.partial(self.journal.append, records), "write change journal")
+        if self.journal_bytes >= JOURNAL_COMPACT_BYTES:
+            self.compact_journal()
+
+    def compact_journal(self, on_done=None):
+        """
+        Queues a rewrite of csv_file from a snapshot of self.transactions
+        followed by emptying the journal.
+        """
+        self.journal_bytes = 0
+        self.writer.submit(
+            functools.partial(self.journal.compact, self.transactions.copy(), csv_file),
+            f"save to '{csv_file}'", key='transactions', on_done=on_done
+        )
+        if self.summary is not None:
+            # The summary already reflects the saved file; sync_history need not reread it
+            self.writer.submit(functools.partial(self.summary.record_source, csv_file), "update budget summary")
+
+    def undo_last_change(self):
+        self.complete_startup()
+        if not self.undo_stack:
+            messagebox.showinfo("Info", "Nothing to undo.")
+            return
+        action = self.undo_stack.pop()
+        if action[0] == 'set':
+            _, original_index, old_identifier = action
+            self.set_identifier(original_index, old_identifier, record_undo=False)
+        elif action[0] == 'bulk':
+            _, old_identifiers = action
+            self.set_identifiers(old_identifiers.index, old_identifiers.to_numpy(), record_undo=False)
+            self.refresh_view()
+        else:
+            # Undo of "Clear All Custom Identifiers": restore the whole column. Rows
+            # labeled since the clear (e.g. by Add Mapping) go back to what they were too.
+            _, old_identifiers = action
+            current = self.transactions['Custom Identifier'].copy()
+            changed = (current != old_identifiers).to_numpy()
+            self.transactions['Custom Identifier'] = old_identifiers
+            self.update_summary(summary_changes(self.transactions, current[changed]))
+            self.refresh_label_counts()
+            now = datetime.now().isoformat()
+            self.append_journal([
+                {'key': key, 'old': old_identifier, 'new': identifier, 'ts': now}
+                for key, old_identifier, identifier in zip(
+                    self.journal_keys(current.index[changed]), current[changed], old_identifiers[changed]
+                )
+            ])
+            self.toggle_hide_processed()
+        self.update_transaction_counter()
+        self.display_transaction()
+
+    def current_row(self):
+        return self.transactions.iloc[self.view_positions[self.current_index]]
+
+    def refresh_label_counts(self):
+        """
+        Recomputes the labeled-row mask and count from the whole frame; only
+        needed after bulk changes such as applying mappings.
+        """
+        self.labeled_mask = (self.transactions['Custom Identifier'].fillna('') != '').to_numpy(copy=True)
+        self.labeled_count = int(self.labeled_mask.sum())
+        self.all_positions = np.arange(len(self.transactions))
+
+    def mark_labeled(self, positions):
+        # Bookkeeping for rows that just received a non-empty identifier
+        self.labeled_count += int((~self.labeled_mask[positions]).sum())
+        self.labeled_mask[positions] = True
+
+    def update_label_count(self, position, is_labeled):
+        # O(1) bookkeeping for a single identifier change
+        if self.labeled_mask[position] != is_labeled:
+            self.labeled_mask[position] = is_labeled
+            self.labeled_count += 1 if is_labeled else -1
 
     def next_transaction(self):
         self.save_current_identifier()
-        if self.current_index < len(self.filtered_transactions) - 1:
+        if self.current_index < len(self.view_positions) - 1:
             self.current_index += 1
             self.update_transaction_counter()
             self.display_transaction()
@@ -471,67 +2703,514 @@ class BudgetTrackerGUI:
 
     def save_to_csv(self):
         self.save_current_identifier()
-        try:
-            # Save the updated transactions DataFrame back to the CSV file
-            self.transactions.to_csv(csv_file, index=False)
+        saved = []
+        # Compact the journal: save the updated transactions DataFrame back to the CSV file
+        self.compact_journal(on_done=saved.append)
+        self.writer.flush()
+        if saved:
             messagebox.showinfo("Success", f"Custom Identifiers saved to '{csv_file}'.")
             # Close the GUI window after saving
-            self.master.destroy()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save to CSV: {e}")
+            self.close()
 
-    def load_processed_transactions(self):
-        self.processed_transactions = set()
-        if os.path.exists("processed_transactions.csv"):
-            try:
-                df = pd.read_csv("processed_transactions.csv")
-                for _, row in df.iterrows():
-                    key = (
-                        str(row.get('Transaction Date', '')),
-                        str(row.get('Description', '')),
-                        str(row.get('Amount', ''))
-                    )
-                    self.processed_transactions.add(key)
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to load processed transactions: {e}")
+    def close(self):
+        """
+        Waits for every pending write to finish (each one is fsynced) before
+        the window is destroyed.
+        """
+        self.complete_startup()
+        self.writer.close()
+        if self.processed_transactions is not None:
+            self.processed_transactions.close()
+        if self.summary is not None:
+            self.summary.close()
+        try:
+            logger.info("Session metrics written to '%s'", metrics.export(metrics_file))
+        except OSError as e:
+            logger.warning("Could not write session metrics: %s", e)
+        self.master.destroy()
+
+    def update_write_status(self, pending):
+        if hasattr(self, 'write_status_label'):
+            self.write_status_label.config(text=f"Saving... ({pending} pending)" if pending else "All changes saved")
 
-    def save_processed_transaction(self, transaction_date, description, amount):
+    def load_processed_transactions(self):
         try:
-            # Append to processed_transactions.csv
-            import csv
-            file_exists = os.path.exists("processed_transactions.csv")
-            with open("processed_transactions.csv", mode='a', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=['Transaction Date', 'Description', 'Amount'])
-                if not file_exists:
-                    writer.writeheader()
-                writer.writerow({
-                    'Transaction Date': transaction_date,
-                    'Description': description,
-                    'Amount': amount
-                })
-            # Add to in-memory set with amount to uniquely identify the transaction
-            self.processed_transactions.add((transaction_date, description, str(amount)))
+            self.processed_transactions = ProcessedTransactionStore()
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to save processed transaction: {e}")
+            messagebox.showerror("Error", f"Failed to load processed transactions: {e}")
+            # Keep working for this session without persisting processed keys
+            self.processed_transactions = ProcessedTransactionStore(db_path=":memory:", legacy_csv_path="")
 
-    def toggle_hide_processed(self):
-        # Update the transactions DataFrame based on the hide_processed flag
+    def save_processed_transaction(self, processed_row):
+        self.writer.submit(
+            functools.partial(self.processed_transactions.add, *processed_row),
+            "save processed transaction"
+        )
+
+    def filtered_positions(self):
+        # The navigated view for the hide_processed flag; no frame is copied
         if self.hide_processed.get():
-            # Filter to only transactions without Custom Identifier
-            self.filtered_transactions = self.transactions[self.transactions['Custom Identifier'].isnull() | (self.transactions['Custom Identifier'] == '')].reset_index(drop=True)
-        else:
-            # Show all transactions
-            self.filtered_transactions = self.transactions.reset_index(drop=True)
+            # Only transactions without Custom Identifier
+            return np.flatnonzero(~self.labeled_mask)
+        # Show all transactions
+        return self.all_positions
+
+    def toggle_hide_processed(self):
+        self.complete_startup()
+        self.view_positions = self.filtered_positions()
         self.current_index = 0
         self.update_transaction_counter()
         self.display_transaction()
 
+    def refresh_view(self):
+        """
+        Rebuilds the view after rows were labeled in bulk without going back
+        to its start: the shown row stays shown, or the next row in the view
+        is shown when it has left the view.
+        """
+        if 0 <= self.current_index < len(self.view_positions):
+            position = self.view_positions[self.current_index]
+            self.view_positions = self.filtered_positions()
+            self.current_index = min(int(np.searchsorted(self.view_positions, position)), max(len(self.view_positions) - 1, 0))
+        else:
+            self.view_positions = self.filtered_positions()
+            self.current_index = min(self.current_index, len(self.view_positions))
+        self.update_transaction_counter()
+        self.display_transaction()
+
     def update_transaction_counter(self):
         total = len(self.transactions)
-        remaining = len(self.transactions[self.transactions['Custom Identifier'].isnull() | (self.transactions['Custom Identifier'] == '')])
+        remaining = total - self.labeled_count
         self.transaction_counter_label.config(text=f"Total Transactions: {total} | Remaining without Custom Identifier: {remaining}")
+        if self.grid is not None:
+            self.grid.render()
+
+    def show_grid(self):
+        self.complete_startup()
+        if self.grid is None:
+            self.grid = TransactionGrid(self)
+        else:
+            self.grid.window.lift()
+
+    def search_index(self):
+        # Built on first use; dates, amounts and descriptions do not change during a session
+        if self.search is None:
+            self.complete_startup()
+            with metrics.stage('build_search_index'):
+                self.search = TransactionSearch(self.transactions, self.description_index)
+        return self.search
+
+    def show_search(self):
+        if self.search_window is None:
+            self.search_window = SearchWindow(self)
+        else:
+            self.search_window.window.lift()
+
+    def jump_to(self, position):
+        """
+        Shows the transaction at frame position `position`, leaving the
+        unlabeled-only view first if the row is not in it.
+        """
+        self.save_current_identifier()
+        if self.hide_processed.get() and self.labeled_mask[position]:
+            # Labeled rows are not in the unlabeled-only view
+            self.hide_processed.set(False)
+            self.toggle_hide_processed()
+        self.current_index = int(np.searchsorted(self.view_positions, position))
+        self.update_transaction_counter()
+        self.display_transaction()
+
+class TransactionGrid:
+    """
+    Window listing the tracker's current view (all transactions, or only the
+    unlabeled ones) in a ttk.Treeview. Only GRID_PAGE_ROWS rows exist as
+    tree items at a time; the scrollbar and mouse wheel move a window over
+    the view's positions and the visible page is re-rendered from the frame.
+    Selections are kept by frame position, so they survive scrolling, and
+    "Apply to Selected" labels all of them in one BudgetTrackerGUI.label_rows call.
+    """
+    columns = ['Transaction Date', 'Amount', 'Description', 'Category', 'Account', 'Custom Identifier']
+
+    def __init__(self, app):
+        self.app = app
+        self.offset = 0
+        self.selected = set()
+        self.rendering = False
+        self.window = tk.Toplevel(app.master)
+        self.window.title("Transactions")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        controls = ttk.Frame(self.window)
+        controls.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Label(controls, text="Custom Identifier:").pack(side=tk.LEFT, padx=5)
+        self.identifier_var = tk.StringVar()
+        ttk.Combobox(controls, textvariable=self.identifier_var, values=app.identifier_values).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Apply to Selected", command=self.apply_to_selected).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Select All", command=self.select_all).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Clear Selection", command=self.clear_selection).pack(side=tk.LEFT, padx=5)
+        self.selection_label = ttk.Label(controls, text="")
+        self.selection_label.pack(side=tk.LEFT, padx=5)
+
+        body = ttk.Frame(self.window)
+        body.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.tree = ttk.Treeview(body, columns=self.columns, show='headings', height=GRID_PAGE_ROWS, selectmode='extended')
+        for column in self.columns:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=300 if column == 'Description' else 110, anchor='e' if column == 'Amount' else 'w')
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = ttk.Scrollbar(body, orient='vertical', command=self.on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+        self.tree.bind('<Double-1>', self.on_double_click)
+        self.tree.bind('<MouseWheel>', lambda event: self.scroll_by(-1 if event.delta > 0 else 1, 'units'))
+        self.tree.bind('<Button-4>', lambda event: self.scroll_by(-1, 'units'))
+        self.tree.bind('<Button-5>', lambda event: self.scroll_by(1, 'units'))
+        self.render()
+
+    def page_positions(self):
+        view = self.app.view_positions
+        self.offset = max(0, min(self.offset, len(view) - GRID_PAGE_ROWS))
+        return view[self.offset:self.offset + GRID_PAGE_ROWS]
+
+    def render(self):
+        """
+        Replaces the tree items with the visible page of the current view.
+        """
+        positions = self.page_positions()
+        rows = self.app.transactions.iloc[positions]
+        self.rendering = True
+        try:
+            self.tree.delete(*self.tree.get_children())
+            for position, (_, row) in zip(positions, rows.iterrows()):
+                self.tree.insert('', tk.END, iid=str(position),
+                                 values=[display_value(column, row.get(column, '')) for column in self.columns])
+            visible = [str(position) for position in positions if position in self.selected]
+            self.tree.selection_set(visible)
+        finally:
+            self.rendering = False
+        total = len(self.app.view_positions)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + GRID_PAGE_ROWS) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self.selection_label.config(text=f"{len(self.selected)} selected")
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.offset = int(float(amount) * len(self.app.view_positions))
+            self.render()
+        else:
+            self.scroll_by(int(amount), unit)
+
+    def scroll_by(self, amount, unit):
+        self.offset += amount * (GRID_PAGE_ROWS if unit == 'pages' else 1)
+        self.render()
+        return "break"
+
+    def on_select(self, event=None):
+        if self.rendering:
+            return
+        # The page's rows are replaced by what is selected on it; other pages keep theirs
+        self.selected.difference_update(int(position) for position in self.page_positions())
+        self.selected.update(int(iid) for iid in self.tree.selection())
+        self.selection_label.config(text=f"{len(self.selected)} selected")
+
+    def select_all(self):
+        self.selected = set(self.app.view_positions.tolist())
+        self.render()
+
+    def clear_selection(self):
+        self.selected.clear()
+        self.render()
+
+    def on_double_click(self, event=None):
+        # Show the double-clicked row in the single-transaction view
+        iid = self.tree.focus()
+        if iid:
+            self.app.jump_to(int(iid))
+
+    def apply_to_selected(self):
+        identifier = self.identifier_var.get().strip()
+        if not self.selected or not identifier:
+            messagebox.showwarning("Warning", "Select transactions and an identifier first.")
+            return
+        changed = self.app.label_rows(self.selected, identifier)
+        count = len(self.selected)
+        self.selected.clear()
+        self.app.update_transaction_counter()
+        self.app.display_transaction()
+        messagebox.showinfo("Info", f"'{identifier}' applied to {count} transactions ({changed} changed).")
+
+    def close(self):
+        self.app.grid = None
+        self.window.destroy()
+
+class SearchWindow:
+    """
+    Search box over the app's TransactionSearch. The results are refreshed
+    SEARCH_DELAY_MS after typing stops; the first SEARCH_RESULT_ROWS matches
+    are listed and double-clicking one (or pressing Enter) jumps to it in the
+    main window.
+    """
+    fields = [('text', "Description contains:"), ('amount_min', "Amount from:"), ('amount_max', "Amount to:"),
+              ('date_from', "Date from:"), ('date_to', "Date to:")]
+
+    def __init__(self, app):
+        self.app = app
+        self.index = app.search_index()
+        self.matches = np.zeros(0, dtype=np.int64)
+        self.pending = None
+        self.window = tk.Toplevel(app.master)
+        self.window.title("Search Transactions")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        form = ttk.Frame(self.window)
+        form.pack(fill=tk.X, padx=5, pady=5)
+        self.vars = {}
+        for row, (name, text) in enumerate(self.fields):
+            ttk.Label(form, text=text).grid(row=row, column=0, sticky='e', padx=5, pady=2)
+            var = tk.StringVar()
+            var.trace_add('write', self.schedule_search)
+            ttk.Entry(form, textvariable=var, width=40).grid(row=row, column=1, sticky='w', padx=5, pady=2)
+            self.vars[name] = var
+        self.status_label = ttk.Label(form, text="")
+        self.status_label.grid(row=len(self.fields), column=0, columnspan=2, pady=2)
+
+        body = ttk.Frame(self.window)
+        body.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.results = tk.Listbox(body, width=100, height=20, font=('TkFixedFont',))
+        self.results.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = ttk.Scrollbar(body, orient='vertical', command=self.results.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.results.config(yscrollcommand=scrollbar.set)
+        self.results.bind('<Double-1>', self.jump)
+        self.results.bind('<Return>', self.jump)
+        self.run_search()
+
+    def schedule_search(self, *_):
+        if self.pending is not None:
+            self.window.after_cancel(self.pending)
+        self.pending = self.window.after(SEARCH_DELAY_MS, self.run_search)
+
+    def criteria(self):
+        values = {name: var.get().strip() for name, var in self.vars.items()}
+        return {name: (value if value or name == 'text' else None) for name, value in values.items()}
+
+    def run_search(self):
+        self.pending = None
+        try:
+            with metrics.stage('search'):
+                self.matches = self.index.query(**self.criteria())
+        except ValueError as e:
+            self.status_label.config(text=f"Invalid amount or date: {e}")
+            return
+        self.render()
+
+    def render(self):
+        shown = self.matches[:SEARCH_RESULT_ROWS]
+        rows = self.app.transactions.iloc[shown]
+        self.results.delete(0, tk.END)
+        for _, row in rows.iterrows():
+            self.results.insert(tk.END, "  ".join([
+                display_value('Transaction Date', row['Transaction Date']).ljust(10),
+                display_value('Amount', row['Amount']).rjust(10),
+                display_value('Description', row['Description'])[:50].ljust(50),
+                display_value('Custom Identifier', row.get('Custom Identifier', '')),
+            ]))
+        total = len(self.matches)
+        more = f" (showing the first {len(shown)})" if total > len(shown) else ""
+        self.status_label.config(text=f"{total} matches{more}")
+
+    def jump(self, event=None):
+        selection = self.results.curselection()
+        if selection and selection[0] < len(self.matches):
+            self.app.jump_to(int(self.matches[selection[0]]))
+
+    def close(self):
+        if self.pending is not None:
+            self.window.after_cancel(self.pending)
+        self.app.search_window = None
+        self.window.destroy()
+
+def _parse_month(value):
+    try:
+        parsed = datetime.strptime(value, "%Y-%m")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got '{value}'")
+    return parsed.year, parsed.month
+
+def categorized_output_path(source_path, month=None, output_dir=None):
+    """
+    Returns where the categorize command writes a labeled export, e.g.
+    export.csv -> export_2026-09.categorized.csv
+    """
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    if month:
+        stem += f"_{month[0]:04d}-{month[1]:02d}"
+    return os.path.join(output_dir or os.path.dirname(source_path), stem + ".categorized.csv")
+
+def run_categorize(input_paths, month=None, output_dir=None, mappings_path=None, use_rules=True):
+    """
+    Labels each export without a display and writes it next to the input (or
+    into output_dir). Prints per-file and total throughput; returns an exit code.
+    """
+    mappings = load_mapping_file(mappings_path)
+    # Import pandas before the clock starts so the first file's rate is comparable
+    importlib.import_module('pandas')
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    total_rows = 0
+    total_seconds = 0.0
+    failures = 0
+    for path in input_paths:
+        start = time.perf_counter()
+        try:
+            # Every column of the export is kept in the labeled file
+            with metrics.stage('load'):
+                df = read_transactions(path, columns=None)
+            rows_read = len(df)
+            metrics.count('rows_loaded', rows_read)
+            if month:
+                with metrics.stage('filter'):
+                    dates = df['Transaction Date']
+                    df = df[(dates.dt.year == month[0]) & (dates.dt.month == month[1])].copy()
+            with metrics.stage('categorize'):
+                categorize_transactions(df, mappings, use_rules=use_rules)
+            output_path = categorized_output_path(path, month, output_dir)
+            with metrics.stage('save_csv'):
+                to_export_frame(df).to_csv(output_path, index=False)
+            metrics.count('rows_saved', len(df))
+            labeled = int((df['Custom Identifier'] != '').sum())
+        except Exception as e:
+            print(f"{path}: failed: {e}", file=sys.stderr)
+            failures += 1
+            continue
+        elapsed = time.perf_counter() - start
+        total_rows += rows_read
+        total_seconds += elapsed
+        print(f"{path}: {rows_read} rows in {elapsed:.3f}s ({rows_read / max(elapsed, 1e-9):,.0f} rows/s), "
+              f"{labeled} of {len(df)} labeled -> {output_path}")
+    if len(input_paths) > 1:
+        print(f"Total: {total_rows} rows from {len(input_paths) - failures} files in {total_seconds:.3f}s "
+              f"({total_rows / max(total_seconds, 1e-9):,.0f} rows/s)")
+    return 1 if failures else 0
+
+def run_memory_report(input_paths):
+    """
+    Prints the memory used by each column of the tracker's frame for each
+    export, typed and as plain strings. Returns an exit code.
+    """
+    failures = 0
+    for path in input_paths:
+        try:
+            typed = read_transactions(path)
+            read_columns = [column for column in typed.columns
+                            if column not in DERIVED_COLUMNS and column not in UNPARSED_COLUMNS.values()]
+            untyped = pd.read_csv(path, usecols=read_columns, dtype=object)
+        except Exception as e:
+            print(f"{path}: failed: {e}", file=sys.stderr)
+            failures += 1
+            continue
+        report = memory_report(typed)
+        # DERIVED_COLUMNS and UNPARSED_COLUMNS have no untyped counterpart
+        report['untyped bytes'] = report['column'].map(memory_report(untyped).set_index('column')['bytes']).astype('Int64')
+        print(f"{path}: {len(typed)} rows")
+        print(report.to_string(index=False))
+    return 1 if failures else 0
+
+def run_ingest(input_paths, workers=None):
+    """
+    Ingests exports into the transaction history without a display and
+    prints what was added. Returns an exit code.
+    """
+    start = time.perf_counter()
+    try:
+        rows = TransactionHistory().ingest_many(input_paths, workers=workers)
+    except Exception as e:
+        print(f"Ingest failed: {e}", file=sys.stderr)
+        return 1
+    counters = metrics.to_dict()['counters']
+    print(f"{rows} rows from {len(input_paths)} files in {time.perf_counter() - start:.3f}s: "
+          f"{counters.get('duplicates_removed', 0)} duplicates removed, "
+          f"{counters.get('transfers_linked', 0)} transfers linked -> {history_dir}")
+    return 0
+
+def run_summary(kind='trailing', months=SUMMARY_TRAILING_MONTHS, output_path=None):
+    """
+    Brings the budget summary up to date with the transaction history and
+    prints a report, or exports it to output_path. Returns an exit code.
+    """
+    summary = BudgetSummary()
+    try:
+        summary.sync_history()
+        report = summary.report(kind, months)
+    except Exception as e:
+        print(f"Summary failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        summary.close()
+    if output_path:
+        export_report(report, output_path)
+        print(f"{kind} report with {len(report)} identifiers -> {output_path}")
+    else:
+        print(report.to_string(float_format=lambda value: f"{value:,.2f}"))
+    return 0
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Personal budget tracker. Runs the GUI when no command is given.")
+    parser.add_argument('--log-level', default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help="Logging threshold (default: WARNING)")
+    parser.add_argument('--metrics', metavar='JSON',
+                        help=f"Write the session's stage timings and counters here (the GUI defaults to {metrics_dir}/)")
+    parser.add_argument('--profile', metavar='DIR', help="Run each stage under cProfile and tracemalloc and write the reports to DIR")
+    subparsers = parser.add_subparsers(dest='command')
+    categorize = subparsers.add_parser('categorize', help="Label exports without a display")
+    categorize.add_argument('--in', dest='inputs', nargs='+', required=True, metavar='CSV', help="Bank export(s) to label")
+    categorize.add_argument('--month', type=_parse_month, help="Only keep transactions from this month (YYYY-MM)")
+    categorize.add_argument('--out-dir', help="Directory for the labeled files (default: next to each input)")
+    categorize.add_argument('--mappings', help=f"Mapping file (default: {mapping_file})")
+    categorize.add_argument('--no-rules', action='store_true', help="Do not fill blanks from the built-in identifier rules")
+    ingest = subparsers.add_parser('ingest', help="Add exports from one or more accounts to the transaction history")
+    ingest.add_argument('--in', dest='inputs', nargs='+', required=True, metavar='CSV', help="Bank export(s) to ingest")
+    ingest.add_argument('--workers', type=int, help="Parser processes (default: one per file, up to the CPU count)")
+    summary = subparsers.add_parser('summary', help="Report spend per identifier from the transaction history")
+    summary.add_argument('--report', choices=SUMMARY_REPORTS, default=SUMMARY_REPORTS[0], help="Report to show (default: trailing)")
+    summary.add_argument('--months', type=int, default=SUMMARY_TRAILING_MONTHS, help="Months in the trailing report")
+    summary.add_argument('--out', help="Export to this .xlsx or .csv file instead of printing")
+    memory = subparsers.add_parser('memory', help="Report the memory used by each column of an export")
+    memory.add_argument('--in', dest='inputs', nargs='+', required=True, metavar='CSV', help="Bank export(s) to measure")
+    return parser
+
+def main(argv=None):
+    global metrics_file
+    args = build_arg_parser().parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    metrics_file = args.metrics
+    if args.profile:
+        metrics.enable_profiling(args.profile)
+    if args.command in ('categorize', 'ingest', 'summary', 'memory'):
+        if args.command == 'categorize':
+            status = run_categorize(args.inputs, args.month, args.out_dir, args.mappings, use_rules=not args.no_rules)
+        elif args.command == 'ingest':
+            status = run_ingest(args.inputs, args.workers)
+        elif args.command == 'summary':
+            status = run_summary(args.report, args.months, args.out)
+        else:
+            status = run_memory_report(args.inputs)
+        if metrics_file:
+            metrics.export(metrics_file)
+        return status
+    if not tk_available():
+        print("tkinter is not available; only the 'categorize', 'ingest', 'summary' and 'memory' commands can run here.", file=sys.stderr)
+        return 1
+    run_gui()
+    return 0
+
+def run_gui():
+    # Import pandas in the background while the date filter window is open
+    threading.Thread(target=importlib.import_module, args=('pandas',), daemon=True).start()
 
-def main():
     # First show the date filter GUI
     filter_root = tk.Tk()
     filter_app = DateFilterGUI(filter_root)
@@ -539,7 +3218,7 @@ def main():
     
     # Check if user proceeded with file selection and date selection
     if not filter_app.proceed:
-        print("Operation cancelled. Exiting.")
+        logger.info("Operation cancelled. Exiting.")
         return
         
     if not filter_app.selected_file:
@@ -547,7 +3226,7 @@ def main():
         return
     
     # Filter transactions by selected month and year
-    filtered_count, total_count = filter_transactions_by_date(filter_app.selected_month, filter_app.selected_year)
+    filtered_count, total_count = filter_transactions_by_date(filter_app.selected_month, filter_app.selected_year, filter_app.selected_files)
     
     if filtered_count == 0:
         messagebox.showinfo("Info", f"No transactions found for {filter_app.month_var.get()} {filter_app.selected_year}.")
@@ -562,4 +3241,4 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+The incremental paths of stonestreetBudget agree with recomputing from
+scratch: the budget summary updated change by change against
+BudgetSummary.rebuild_months, and mapping keys applied one at a time with
+apply_mapping_key against apply_mappings.
+
+    python -m pytest -q tests
+"""
+import os
+import random
+import sys
+
+import pandas as pd
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+import stonestreetBudget as sb
+from synthetic import generate_mappings, generate_transactions
+
+IDENTIFIERS = ['', 'Groceries', 'Coffee', 'Rent', 'Fuel']
+
+
+@pytest.fixture
+def transactions(tmp_path, monkeypatch):
+    # A typed session frame read from a synthetic export, with some rows labeled
+    monkeypatch.setattr(sb, 'cache_dir', str(tmp_path / "cache"))
+    monkeypatch.setattr(sb, '_parse_cache', None)
+    csv_path = tmp_path / "export.csv"
+    generate_transactions(2000, seed=1).to_csv(csv_path, index=False)
+    transactions, _ = sb.load_session_transactions(str(csv_path))
+    rng = random.Random(1)
+    transactions['Custom Identifier'] = [rng.choice(IDENTIFIERS) for _ in range(len(transactions))]
+    return transactions
+
+
+def summary_rows(summary):
+    with summary.lock:
+        return {table: sorted(summary.conn.execute(f"SELECT * FROM {table}"))
+                for table in ('amounts', 'monthly')}
+
+
+def assert_matches_rebuild(summary, transactions, tmp_path):
+    rebuilt = sb.BudgetSummary(str(tmp_path / "rebuilt.db"))
+    try:
+        rebuilt.rebuild_months(transactions)
+        assert summary_rows(summary) == summary_rows(rebuilt)
+    finally:
+        rebuilt.close()
+        os.remove(tmp_path / "rebuilt.db")
+
+
+@pytest.fixture
+def summary(transactions, tmp_path):
+    summary = sb.BudgetSummary(str(tmp_path / "summary.db"))
+    summary.rebuild_months(transactions)
+    yield summary
+    summary.close()
+
+
+def test_row_changes_match_rebuild(transactions, summary, tmp_path):
+    rng = random.Random(2)
+    for label in rng.sample(list(transactions.index), 300):
+        old_identifier = transactions.at[label, 'Custom Identifier']
+        new_identifier = rng.choice(IDENTIFIERS)
+        transactions.at[label, 'Custom Identifier'] = new_identifier
+        summary.apply_changes(sb.summary_row_changes(transactions, label, old_identifier, new_identifier))
+    assert_matches_rebuild(summary, transactions, tmp_path)
+
+
+def test_bulk_changes_match_rebuild(transactions, summary, tmp_path):
+    rng = random.Random(3)
+    for _ in range(5):
+        labels = rng.sample(list(transactions.index), 400)
+        old = transactions.loc[labels, 'Custom Identifier'].copy()
+        transactions.loc[labels, 'Custom Identifier'] = rng.choice(IDENTIFIERS)
+        summary.apply_changes(sb.summary_changes(transactions, old))
+    assert_matches_rebuild(summary, transactions, tmp_path)
+
+
+def test_transfer_links_match_rebuild(transactions, tmp_path):
+    # The incoming leg of a linked transfer is left out of the summary
+    credits = (transactions['Amount'] > 0).fillna(False).to_numpy()
+    linked = list(transactions.index[credits][:50]) + list(transactions.index[~credits][:50])
+    transactions['Transfer Link'] = ''
+    transactions.loc[linked, 'Transfer Link'] = 'link'
+    summary = sb.BudgetSummary(str(tmp_path / "summary.db"))
+    try:
+        summary.rebuild_months(transactions)
+        old = transactions.loc[linked, 'Custom Identifier'].copy()
+        transactions.loc[linked, 'Custom Identifier'] = 'Savings'
+        summary.apply_changes(sb.summary_changes(transactions, old))
+        for label in linked[::2]:
+            summary.apply_changes(sb.summary_row_changes(transactions, label, 'Savings', 'Rent'))
+            transactions.at[label, 'Custom Identifier'] = 'Rent'
+        assert_matches_rebuild(summary, transactions, tmp_path)
+    finally:
+        summary.close()
+
+
+def test_restoring_a_cleared_column_matches_rebuild(transactions, summary, tmp_path):
+    # Clear All, then a mapping, then the undo of Clear All restoring the whole column
+    before_clear = transactions['Custom Identifier'].copy()
+    transactions['Custom Identifier'] = ''
+    summary.apply_changes(sb.summary_changes(transactions, before_clear[before_clear != '']))
+    mapped = transactions.index[transactions['Normalized Description'].str.contains('aldi', regex=False).to_numpy()]
+    transactions.loc[mapped, 'Custom Identifier'] = 'Groceries'
+    summary.apply_changes(sb.summary_changes(transactions, pd.Series('', index=mapped)))
+    current = transactions['Custom Identifier'].copy()
+    changed = (current != before_clear).to_numpy()
+    transactions['Custom Identifier'] = before_clear
+    summary.apply_changes(sb.summary_changes(transactions, current[changed]))
+    assert_matches_rebuild(summary, transactions, tmp_path)
+
+
+@pytest.mark.parametrize('keys', [10, 200])
+def test_mapping_keys_one_at_a_time_match_apply_mappings(transactions, keys):
+    mappings = generate_mappings(keys, seed=4)
+    expected = transactions.copy()
+    sb.apply_mappings(expected, mappings)
+
+    incremental = transactions.copy()
+    description_index = sb.DescriptionIndex(incremental['Normalized Description'])
+    added = {}
+    for key, identifier in mappings.items():
+        added[key] = identifier
+        sb.apply_mapping_key(incremental, added, key, description_index)
+    assert incremental['Custom Identifier'].tolist() == expected['Custom Identifier'].tolist()
+
+
+def test_changed_mapping_key_matches_apply_mappings(transactions):
+    # Changing the identifier of an existing key relabels the rows it matches first
+    mappings = generate_mappings(50, seed=5)
+    incremental = transactions.copy()
+    description_index = sb.DescriptionIndex(incremental['Normalized Description'])
+    sb.apply_mappings(incremental, mappings, description_index)
+    key = list(mappings)[10]
+    mappings[key] = 'Changed'
+    sb.apply_mapping_key(incremental, mappings, key, description_index)
+
+    expected = transactions.copy()
+    sb.apply_mappings(expected, mappings)
+    assert incremental['Custom Identifier'].tolist() == expected['Custom Identifier'].tolist()
@@ -0,0 +1,83 @@
+"""
+TransactionHistory.ingest_many deduplicates overlapping exports by row
+hash: exports of one account overlap however their files are named, while
+the same charge on two real accounts is kept once per account.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, REPO_DIR)
+
+import stonestreetBudget as sb
+
+DECEMBER = {'Transaction Date': '12/15/2025', 'Amount': '-40.00', 'Description': 'WEIS MARKETS #12', 'Category': 'Groceries'}
+JANUARY = {'Transaction Date': '01/10/2026', 'Amount': '-12.50', 'Description': 'LOST SOCK COFFEE', 'Category': 'Restaurants'}
+FEBRUARY = {'Transaction Date': '02/03/2026', 'Amount': '-9.99', 'Description': 'SPOTIFY', 'Category': 'Entertainment'}
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sb, 'cache_dir', str(tmp_path / "cache"))
+    monkeypatch.setattr(sb, '_parse_cache', None)
+    return sb.TransactionHistory(str(tmp_path / "transaction_history"))
+
+
+def write_export(path, rows, account=None):
+    df = pd.DataFrame(rows)
+    if account is not None:
+        df['Account'] = account
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize('together', [True, False])
+def test_overlapping_exports_of_one_account_deduplicate(history, tmp_path, together):
+    # Neither export names its account, so only the file names differ
+    first = write_export(tmp_path / "checking_dec_jan.csv", [DECEMBER, JANUARY])
+    second = write_export(tmp_path / "checking_jan_feb.csv", [JANUARY, FEBRUARY])
+    if together:
+        history.ingest_many([first, second])
+    else:
+        history.ingest(first)
+        history.ingest(second)
+    january = history.read_partition(2026, 1)
+    assert len(january) == 1
+    assert len(history.read_partition(2025, 12)) == 1
+    assert len(history.read_partition(2026, 2)) == 1
+
+
+def test_repeated_charge_within_an_export_is_kept(history, tmp_path):
+    first = write_export(tmp_path / "checking_dec_jan.csv", [DECEMBER, JANUARY, JANUARY])
+    second = write_export(tmp_path / "checking_jan_feb.csv", [JANUARY, FEBRUARY])
+    history.ingest_many([first, second])
+    assert len(history.read_partition(2026, 1)) == 2
+
+
+@pytest.mark.parametrize('together', [True, False])
+def test_same_charge_on_two_accounts_is_kept_per_account(history, tmp_path, together):
+    card_a = write_export(tmp_path / "cardA.csv", [JANUARY], account='Card A')
+    card_b = write_export(tmp_path / "cardB.csv", [JANUARY], account='Card B')
+    if together:
+        history.ingest_many([card_a, card_b])
+    else:
+        history.ingest(card_a)
+        history.ingest(card_b)
+    january = history.read_partition(2026, 1)
+    assert sorted(january['Account']) == ['Card A', 'Card B']
+
+
+def test_accounts_given_per_file_are_kept_apart(history, tmp_path):
+    # Different contents, or the second file counts as already ingested
+    card_a = write_export(tmp_path / "export1.csv", [JANUARY])
+    card_b = write_export(tmp_path / "export2.csv", [JANUARY, FEBRUARY])
+    history.ingest(card_a, account='Card A')
+    history.ingest(card_b, account='Card B')
+    assert sorted(history.read_partition(2026, 1)['Account']) == ['Card A', 'Card B']
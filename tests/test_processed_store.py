@@ -0,0 +1,51 @@
+"""
+ProcessedTransactionStore opens whatever state the legacy
+processed_transactions.csv is in: a malformed CSV is skipped (and retried
+on the next open), and legacy_csv_path='' imports nothing.
+
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, REPO_DIR)
+
+import stonestreetBudget as sb
+
+LEGACY_CSV = "Transaction Date,Description,Amount\n01/10/2026,LOST SOCK COFFEE,-12.50\n"
+
+
+def test_malformed_legacy_csv_still_opens_the_store(tmp_path):
+    csv_path = tmp_path / "processed_transactions.csv"
+    csv_path.write_text(LEGACY_CSV + "01/11/2026,SPOTIFY,-9.99,extra\n")
+    store = sb.ProcessedTransactionStore(str(tmp_path / "processed.db"), str(csv_path))
+    try:
+        assert len(store) == 0
+        assert store.add_many([(1, '2026-01-10', 'lost sock coffee', '-12.50')]) == 1
+    finally:
+        store.close()
+
+    # Fixing the CSV imports it on the next open
+    csv_path.write_text(LEGACY_CSV)
+    store = sb.ProcessedTransactionStore(str(tmp_path / "processed.db"), str(csv_path))
+    try:
+        assert len(store) == 2
+    finally:
+        store.close()
+
+
+def test_empty_legacy_path_imports_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / sb.legacy_processed_file).write_text(LEGACY_CSV)
+    store = sb.ProcessedTransactionStore(":memory:", "")
+    try:
+        assert len(store) == 0
+    finally:
+        store.close()
+    store = sb.ProcessedTransactionStore(":memory:")
+    try:
+        assert len(store) == 1
+    finally:
+        store.close()